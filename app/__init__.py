@@ -3,7 +3,7 @@ import logging
 from flask import Flask
 from flask_cors import CORS
 from config.config import config
-from app.services.prediction_service import prediction_service
+from app.extensions import sock
 
 def create_app(config_name: str = None) -> Flask:
     """
@@ -26,6 +26,9 @@ def create_app(config_name: str = None) -> Flask:
     # Configurar CORS
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # Configurar WebSockets
+    sock.init_app(app)
+    
     # Configurar logging
     setup_logging(app)
     
@@ -56,6 +59,9 @@ def initialize_services() -> None:
     """
     Inicializa los servicios de la aplicación
     """
+    # Import diferido: TensorFlow solo se carga al crear la aplicación
+    from app.services.prediction_service import prediction_service
+    
     try:
         # Cargar el modelo de predicción
         prediction_service.load_model()
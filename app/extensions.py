@@ -0,0 +1,4 @@
+from flask_sock import Sock
+
+# Extensiones compartidas, inicializadas en create_app
+sock = Sock()
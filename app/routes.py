@@ -1,7 +1,14 @@
+import json
+import time
 import logging
-from flask import Blueprint, request
+from flask import Blueprint, request, current_app
+from app.extensions import sock
 from app.services.prediction_service import prediction_service
-from app.utils.image_utils import process_uploaded_image
+from app.services.history_service import history_service
+from app.services.model_registry import ModelNotFoundError
+from app.services.stream_service import StreamSession, parse_smoothing, stream_limiter
+from app.utils.tiling_utils import parse_tile_grid, parse_tile_overlap
+from app.utils.image_utils import compute_file_hash, process_uploaded_image
 from app.utils.response_utils import success_response, error_response
 
 logger = logging.getLogger(__name__)
@@ -21,6 +28,8 @@ def home():
             "endpoints": {
                 "health": "/api/ping",
                 "scan": "/api/scan",
+                "stream": "/api/stream",
+                "stats": "/api/stats",
                 "model_info": "/api/model/info"
             }
         },
@@ -56,6 +65,48 @@ def scan_vegetable():
         
         file = request.files['image']
         
+        # Modelo solicitado (opcional), por defecto el del manifiesto
+        model_name = request.form.get('model') or request.args.get('model')
+        try:
+            model_spec = prediction_service.get_model_spec(model_name)
+        except ModelNotFoundError:
+            logger.warning(f"Modelo no registrado: {model_name}")
+            return error_response(
+                message=f"El modelo '{model_name}' no está registrado",
+                status_code=404,
+                error_code="UNKNOWN_MODEL"
+            )
+        if not model_spec.available:
+            logger.warning(f"Modelo no disponible: {model_spec.unavailable_reason}")
+            return error_response(
+                message=model_spec.unavailable_reason,
+                status_code=503,
+                error_code="MODEL_UNAVAILABLE"
+            )
+        
+        # Modo de clasificación: imagen completa o por tiles
+        mode = request.form.get('mode') or request.args.get('mode') or 'single'
+        if mode not in ('single', 'tiles'):
+            return error_response(
+                message=f"Modo de clasificación no soportado: '{mode}'. Opciones: single, tiles",
+                error_code="INVALID_PARAMETER"
+            )
+        
+        if mode == 'tiles':
+            try:
+                tile_grid = parse_tile_grid(
+                    request.form.get('tile_grid') or request.args.get('tile_grid') or current_app.config['TILE_DEFAULT_GRID']
+                )
+                tile_overlap = parse_tile_overlap(
+                    request.form.get('tile_overlap') or request.args.get('tile_overlap') or current_app.config['TILE_DEFAULT_OVERLAP']
+                )
+            except ValueError as e:
+                logger.warning(f"Parámetros de tiles inválidos: {str(e)}")
+                return error_response(message=str(e), error_code="INVALID_PARAMETER")
+        
+        # Hash del contenido para el historial (antes de que PIL lea el stream)
+        image_hash = compute_file_hash(file)
+        
         # Procesar la imagen
         image = process_uploaded_image(file)
         if image is None:
@@ -66,10 +117,15 @@ def scan_vegetable():
             )
             return error_resp
         
-        logger.info(f"Procesando imagen para clasificación: {file.filename}")
+        logger.info(f"Procesando imagen para clasificación: {file.filename} (modelo: {model_spec.name})")
         
         # Realizar la predicción
-        prediction_result = prediction_service.predict(image)
+        start = time.perf_counter()
+        if mode == 'tiles':
+            prediction_result = prediction_service.predict_tiles(image, tile_grid, tile_overlap, model_spec.name)
+        else:
+            prediction_result = prediction_service.predict(image, model_spec.name)
+        latency_ms = (time.perf_counter() - start) * 1000
         logger.info(f"Resultado de predicción: {prediction_result}")
         logger.info(f"Tipo de resultado: {type(prediction_result)}")
         
@@ -97,7 +153,8 @@ def scan_vegetable():
             'confidence': prediction_result['confidence'],
             'model_info': {
                 'model_used': prediction_result.get('model_used', False),
-                'available_classes': prediction_service.class_names
+                'model_name': model_spec.name,
+                'available_classes': model_spec.labels
             }
         }
         
@@ -105,12 +162,24 @@ def scan_vegetable():
         if 'all_predictions' in prediction_result:
             response_data['detailed_predictions'] = prediction_result['all_predictions']
         
+        # Incluir el detalle por tiles
+        if mode == 'tiles':
+            response_data['tiling'] = prediction_result['tiling']
+            response_data['label_counts'] = prediction_result['label_counts']
+            response_data['tiles'] = prediction_result['tiles']
+        
         # Incluir nota si es predicción simulada
         if 'note' in prediction_result:
             response_data['note'] = prediction_result['note']
         
         logger.info(f"Predicción exitosa: {prediction_result['prediction']} ({prediction_result['confidence']}%)")
         
+        # Registrar en el historial (se escribe en segundo plano)
+        history_service.record(
+            prediction_result, image_hash, latency_ms,
+            mode=mode, model_version=model_spec.version or model_spec.sha256
+        )
+        
         success_resp = success_response(
             data=response_data,
             message="Clasificación completada exitosamente"
@@ -128,17 +197,72 @@ def scan_vegetable():
         logger.info(f"Enviando error 500 al frontend: {error_resp[0].get_json()}")
         return error_resp
 
+@sock.route('/stream', bp=main)
+def stream_scan(ws):
+    """
+    Endpoint WebSocket para clasificar frames de cámara en vivo
+    Parámetros de query opcionales: model, smoothing
+    """
+    model_name = request.args.get('model')
+    try:
+        model_spec = prediction_service.get_model_spec(model_name)
+        smoothing = parse_smoothing(
+            request.args.get('smoothing', current_app.config['STREAM_DEFAULT_SMOOTHING'])
+        )
+    except ModelNotFoundError:
+        ws.send(json.dumps({
+            'type': 'error',
+            'error_code': 'UNKNOWN_MODEL',
+            'message': f"El modelo '{model_name}' no está registrado"
+        }))
+        return
+    except ValueError as e:
+        ws.send(json.dumps({'type': 'error', 'error_code': 'INVALID_PARAMETER', 'message': str(e)}))
+        return
+    
+    if not model_spec.available:
+        ws.send(json.dumps({
+            'type': 'error',
+            'error_code': 'MODEL_UNAVAILABLE',
+            'message': model_spec.unavailable_reason
+        }))
+        return
+    
+    if not stream_limiter.acquire():
+        logger.warning(f"Conexión de streaming rechazada: límite de {stream_limiter.max_connections} alcanzado")
+        ws.send(json.dumps({
+            'type': 'error',
+            'error_code': 'STREAM_LIMIT_REACHED',
+            'message': 'Se alcanzó el máximo de conexiones de streaming, intente más tarde'
+        }))
+        return
+    
+    try:
+        logger.info(f"Nueva conexión de streaming (modelo: {model_name or prediction_service.default_model}, suavizado: {smoothing})")
+        StreamSession(ws, model_name, smoothing).run()
+    finally:
+        stream_limiter.release()
+
 @main.route('/model/info', methods=['GET'])
 def model_info():
     """
-    Endpoint para obtener información del modelo
+    Endpoint para obtener información de los modelos registrados
     """
     try:
+        cache = prediction_service.cache
+        default_spec = prediction_service.get_model_spec()
         model_info = {
             'model_loaded': prediction_service.is_model_loaded,
-            'model_path': prediction_service.model.name if prediction_service.is_model_loaded else None,
-            'available_classes': prediction_service.class_names,
-            'total_classes': len(prediction_service.class_names)
+            'model_path': default_spec.path,
+            'available_classes': default_spec.labels,
+            'total_classes': len(default_spec.labels),
+            'default_model': prediction_service.default_model,
+            'models': prediction_service.get_models_info(),
+            'cache': {
+                'max_bytes': cache.max_bytes,
+                'used_bytes': cache.used_bytes,
+                'idle_timeout': cache.idle_timeout
+            }
         }
         
         return success_response(
@@ -153,3 +277,22 @@ def model_info():
             status_code=500,
             error_code="MODEL_INFO_ERROR"
         )
+
+@main.route('/stats', methods=['GET'])
+def stats():
+    """
+    Endpoint de estadísticas agregadas de las últimas clasificaciones
+    """
+    try:
+        return success_response(
+            data=history_service.get_stats(),
+            message="Estadísticas obtenidas exitosamente"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error al obtener estadísticas: {str(e)}")
+        return error_response(
+            message="Error al obtener estadísticas",
+            status_code=500,
+            error_code="STATS_ERROR"
+        )
@@ -0,0 +1,514 @@
+import os
+import abc
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los rangos del histograma de confianza (en %)
+CONFIDENCE_BUCKETS = list(range(10, 101, 10))
+
+@dataclass
+class HistoryRecord:
+    """Registro de una clasificación"""
+    created_at: float
+    image_hash: str
+    model_name: str
+    model_version: Optional[str]
+    mode: str
+    prediction: str
+    confidence: float
+    top_k: List[List[Any]]
+    latency_ms: float
+
+class HistoryBackend(abc.ABC):
+    """
+    Interfaz de almacenamiento del historial
+
+    write_batch() se llama siempre desde el hilo escritor, por lo que las
+    implementaciones no necesitan ser thread-safe. read_stats() se llama
+    desde los hilos de las peticiones y puede ejecutarse en cualquier
+    worker, por lo que debe leer los agregados del almacenamiento compartido.
+    """
+
+    @abc.abstractmethod
+    def write_batch(self, records: List[HistoryRecord]) -> None:
+        """Escribe un batch de registros y actualiza los agregados en una sola transacción"""
+
+    @abc.abstractmethod
+    def read_stats(self) -> Dict[str, "WindowStats"]:
+        """Retorna los agregados de la ventana de cada modo"""
+
+    def close(self) -> None:
+        pass
+
+@dataclass
+class WindowStats:
+    """Agregados de la ventana de clasificaciones recientes de un modo"""
+    class_counts: Dict[str, int] = field(default_factory=dict)
+    model_counts: Dict[str, int] = field(default_factory=dict)
+    confidence_histogram: List[int] = field(default_factory=lambda: [0] * len(CONFIDENCE_BUCKETS))
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return len(self.latencies)
+
+    def merge(self, other: "WindowStats") -> None:
+        for key, count in other.class_counts.items():
+            self.class_counts[key] = self.class_counts.get(key, 0) + count
+        for key, count in other.model_counts.items():
+            self.model_counts[key] = self.model_counts.get(key, 0) + count
+        for index, count in enumerate(other.confidence_histogram):
+            self.confidence_histogram[index] += count
+        self.latencies.extend(other.latencies)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = None
+        if self.latencies:
+            latencies = np.asarray(self.latencies, dtype=np.float64)
+            p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+            latency = {
+                'avg': round(float(latencies.mean()), 2),
+                'p50': round(float(p50), 2),
+                'p90': round(float(p90), 2),
+                'p95': round(float(p95), 2),
+                'p99': round(float(p99), 2),
+                'max': round(float(latencies.max()), 2)
+            }
+
+        return {
+            'records_in_window': self.size,
+            'class_counts': dict(sorted(self.class_counts.items(), key=lambda item: item[1], reverse=True)),
+            'model_counts': dict(sorted(self.model_counts.items(), key=lambda item: item[1], reverse=True)),
+            'confidence_histogram': {
+                f"{upper - 10}-{upper}": count
+                for upper, count in zip(CONFIDENCE_BUCKETS, self.confidence_histogram)
+            },
+            'latency_ms': latency
+        }
+
+def confidence_bucket(confidence: float) -> int:
+    """Índice del rango del histograma de confianza (0-10, 10-20, ..., 90-100)"""
+    return max(0, min(int(confidence // 10), len(CONFIDENCE_BUCKETS) - 1))
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """
+    Historial en una base de datos SQLite local, un batch por transacción
+
+    Además de scan_history, cada batch actualiza en la misma transacción:
+
+    - stats_window: las últimas `window` clasificaciones de cada modo
+      (predicción, modelo, rango de confianza y latencia)
+    - stats_counters: contadores por modo de clases, modelos y rangos de
+      confianza de esa ventana, que se incrementan al entrar un registro y
+      se decrementan al salir
+
+    Así todos los workers de gunicorn comparten los mismos agregados y
+    read_stats() nunca recorre el historial completo. Solo la conexión del
+    hilo escritor configura la base de datos y crea el esquema; las lecturas
+    usan conexiones simples, una por hilo.
+    """
+
+    def __init__(self, db_path: str, window: int = Config.STATS_WINDOW):
+        self.db_path = db_path
+        self.window = window
+        self._connection: Optional[sqlite3.Connection] = None
+        self._readers = threading.local()
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        # Transacciones explícitas: BEGIN IMMEDIATE al escribir, BEGIN al leer
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        # WAL permite que varios workers de gunicorn escriban sin bloquear lecturas
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS scan_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                image_hash TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                model_version TEXT,
+                mode TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                top_k TEXT NOT NULL,
+                latency_ms REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_scan_history_created_at ON scan_history (created_at);
+            CREATE TABLE IF NOT EXISTS stats_window (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mode TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                latency_ms REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_stats_window_mode ON stats_window (mode, id);
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                mode TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (mode, kind, key)
+            );
+        ''')
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        # La conexión se crea en el hilo escritor, que es el único que la usa
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def write_batch(self, records: List[HistoryRecord]) -> None:
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                '''
+                INSERT INTO scan_history
+                    (created_at, image_hash, model_name, model_version, mode,
+                     prediction, confidence, top_k, latency_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                [
+                    (r.created_at, r.image_hash, r.model_name, r.model_version, r.mode,
+                     r.prediction, r.confidence, json.dumps(r.top_k), r.latency_ms)
+                    for r in records
+                ]
+            )
+            self._update_window(connection, records)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _update_window(self, connection: sqlite3.Connection, records: List[HistoryRecord]) -> None:
+        window_rows = [
+            (r.mode, r.prediction, r.model_name, confidence_bucket(r.confidence), r.latency_ms)
+            for r in records
+        ]
+        connection.executemany(
+            'INSERT INTO stats_window (mode, prediction, model_name, bucket, latency_ms) VALUES (?, ?, ?, ?, ?)',
+            window_rows
+        )
+
+        deltas = Counter()
+        for mode, prediction, model_name, bucket, _ in window_rows:
+            deltas[(mode, 'class', prediction)] += 1
+            deltas[(mode, 'model', model_name)] += 1
+            deltas[(mode, 'confidence', str(bucket))] += 1
+
+        # Registros que salen de la ventana de cada modo (los más antiguos)
+        for mode in {row[0] for row in window_rows}:
+            size = connection.execute(
+                'SELECT COUNT(*) FROM stats_window WHERE mode = ?', (mode,)
+            ).fetchone()[0]
+            if size <= self.window:
+                continue
+            evicted = connection.execute(
+                'SELECT id, prediction, model_name, bucket FROM stats_window WHERE mode = ? ORDER BY id LIMIT ?',
+                (mode, size - self.window)
+            ).fetchall()
+            for _, prediction, model_name, bucket in evicted:
+                deltas[(mode, 'class', prediction)] -= 1
+                deltas[(mode, 'model', model_name)] -= 1
+                deltas[(mode, 'confidence', str(bucket))] -= 1
+            connection.execute('DELETE FROM stats_window WHERE mode = ? AND id <= ?', (mode, evicted[-1][0]))
+
+        connection.executemany(
+            '''
+            INSERT INTO stats_counters (mode, kind, key, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (mode, kind, key) DO UPDATE SET count = count + excluded.count
+            ''',
+            [(mode, kind, key, delta) for (mode, kind, key), delta in deltas.items() if delta]
+        )
+        connection.execute('DELETE FROM stats_counters WHERE count <= 0')
+
+    def _read_connection(self) -> Optional[sqlite3.Connection]:
+        """
+        Conexión de lectura del hilo actual, sin PRAGMAs ni cambios de esquema
+
+        Returns:
+            La conexión o None si la base de datos aún no existe
+        """
+        connection = getattr(self._readers, 'connection', None)
+        # Una conexión heredada del proceso padre (fork) no se reutiliza
+        if connection is not None and self._readers.pid == os.getpid():
+            return connection
+        if not os.path.exists(self.db_path):
+            return None
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._readers.connection = connection
+        self._readers.pid = os.getpid()
+        return connection
+
+    def read_stats(self) -> Dict[str, WindowStats]:
+        # Se llama desde los hilos de las peticiones, en cualquier worker
+        connection = self._read_connection()
+        if connection is None:
+            return {}
+        connection.execute('BEGIN')
+        try:
+            stats: Dict[str, WindowStats] = {}
+            for mode, kind, key, count in connection.execute('SELECT mode, kind, key, count FROM stats_counters'):
+                mode_stats = stats.setdefault(mode, WindowStats())
+                if kind == 'class':
+                    mode_stats.class_counts[key] = count
+                elif kind == 'model':
+                    mode_stats.model_counts[key] = count
+                elif kind == 'confidence':
+                    mode_stats.confidence_histogram[int(key)] = count
+            for mode, latency_ms in connection.execute('SELECT mode, latency_ms FROM stats_window'):
+                stats.setdefault(mode, WindowStats()).latencies.append(latency_ms)
+            return stats
+        except sqlite3.OperationalError as e:
+            # El hilo escritor todavía no ha creado las tablas de agregados
+            if 'no such table' in str(e):
+                return {}
+            raise
+        finally:
+            connection.execute('COMMIT')
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+# Backends disponibles por nombre (HISTORY_BACKEND)
+HISTORY_BACKENDS = {
+    'sqlite': lambda: SQLiteHistoryBackend(Config.HISTORY_DB_PATH, Config.STATS_WINDOW)
+}
+
+def create_backend(name: str) -> HistoryBackend:
+    """
+    Crea el backend de historial configurado
+
+    Raises:
+        ValueError: Si el backend no está soportado
+    """
+    if name not in HISTORY_BACKENDS:
+        raise ValueError(
+            f"Backend de historial no soportado: '{name}'. Opciones: {', '.join(HISTORY_BACKENDS)}"
+        )
+    backend = HISTORY_BACKENDS[name]()
+    if not isinstance(backend, HistoryBackend):
+        raise ValueError(f"El backend de historial '{name}' no implementa HistoryBackend")
+    return backend
+
+class HistoryService:
+    """
+    Historial de clasificaciones con escritura diferida
+
+    record() solo encola el registro; un hilo en segundo plano escribe los
+    registros en batches, cada HISTORY_BATCH_SIZE registros o cada
+    HISTORY_FLUSH_INTERVAL segundos. Si la cola está llena el registro se
+    descarta y se contabiliza. El backend se valida al crear el servicio,
+    de modo que una configuración inválida falla al arrancar y no en el
+    hilo escritor.
+
+    Los agregados de /api/stats los mantiene el backend junto con cada
+    batch, por lo que reflejan los registros ya escritos de todos los
+    workers (con un retraso de hasta HISTORY_FLUSH_INTERVAL segundos).
+    """
+
+    def __init__(self, backend: Optional[HistoryBackend] = None, enabled: bool = Config.HISTORY_ENABLED,
+                 queue_size: int = Config.HISTORY_QUEUE_SIZE, batch_size: int = Config.HISTORY_BATCH_SIZE,
+                 flush_interval: float = Config.HISTORY_FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if backend is None and enabled:
+            backend = create_backend(Config.HISTORY_BACKEND)
+        self._backend = backend
+        self._queue: "queue.Queue[Optional[HistoryRecord]]" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._close_registered = False
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self.batches = 0
+
+    def _writer_running(self) -> bool:
+        return (
+            self._writer is not None
+            and self._writer_pid == os.getpid()
+            and self._writer.is_alive()
+        )
+
+    def _ensure_writer(self) -> None:
+        """
+        Arranca el hilo escritor en el primer registro, o lo reinicia si terminó
+
+        Se arranca de forma diferida y por proceso porque los hilos no
+        sobreviven al fork de los workers de gunicorn (preload_app).
+        """
+        if self._writer_running():
+            return
+        with self._lock:
+            if self._writer_running():
+                return
+            if self._writer is not None and self._writer_pid == os.getpid():
+                logger.warning("⚠️ El hilo escritor del historial se detuvo, reiniciándolo")
+            self._writer = threading.Thread(target=self._writer_loop, name='history-writer', daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+            if not self._close_registered:
+                atexit.register(self.close)
+                self._close_registered = True
+
+    def record(self, result: Dict[str, Any], image_hash: str, latency_ms: float,
+               mode: str = 'single', model_version: Optional[str] = None) -> bool:
+        """
+        Registra una clasificación sin bloquear la petición
+
+        Args:
+            result: Resultado de PredictionService (prediction, confidence, all_predictions)
+            image_hash: Hash SHA-256 de la imagen clasificada
+            latency_ms: Latencia de la predicción en milisegundos
+            mode: Modo de clasificación (single, tiles, stream)
+            model_version: Versión del modelo según el manifiesto
+
+        Returns:
+            bool: False si el registro se descartó por cola llena o historial desactivado
+        """
+        if not self.enabled:
+            return False
+
+        top_k = sorted(result.get('all_predictions', {}).items(), key=lambda item: item[1], reverse=True)
+        record = HistoryRecord(
+            created_at=time.time(),
+            image_hash=image_hash,
+            model_name=result.get('model_name'),
+            model_version=model_version,
+            mode=mode,
+            prediction=result['prediction'],
+            confidence=result['confidence'],
+            top_k=[list(item) for item in top_k[:Config.HISTORY_TOP_K]],
+            latency_ms=round(latency_ms, 2)
+        )
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            accepted = True
+        except queue.Full:
+            accepted = False
+
+        with self._counters_lock:
+            self.recorded += 1
+            if not accepted:
+                self.dropped += 1
+        return accepted
+
+    def _writer_loop(self) -> None:
+        backend = self._backend
+        try:
+            while True:
+                batch: List[HistoryRecord] = []
+                stop = False
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self._queue.task_done()
+                        stop = True
+                        break
+                    batch.append(record)
+
+                if batch:
+                    self._write(backend, batch)
+                if stop:
+                    return
+        except Exception as e:
+            # El siguiente record() reinicia el hilo
+            logger.exception(f"Error inesperado en el hilo escritor del historial: {str(e)}")
+        finally:
+            # Las conexiones pertenecen a este hilo; un hilo reiniciado abre las suyas
+            try:
+                backend.close()
+            except Exception as e:
+                logger.error(f"Error al cerrar el backend del historial: {str(e)}")
+
+    def _write(self, backend: HistoryBackend, batch: List[HistoryRecord]) -> None:
+        try:
+            backend.write_batch(batch)
+            with self._counters_lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._counters_lock:
+                self.write_errors += len(batch)
+            logger.error(f"Error al escribir {len(batch)} registros del historial: {str(e)}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Espera a que todos los registros encolados se hayan escrito"""
+        if self._writer_running():
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Escribe los registros pendientes y detiene el hilo escritor"""
+        if not self._writer_running():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("No se pudo detener el historial: cola llena")
+            return
+        self._writer.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna los agregados de la ventana y los contadores del historial
+
+        Los agregados combinan la ventana de cada modo (single, tiles,
+        stream) y se desglosan en 'modes', de modo que los frames de
+        streaming no desplazan a las clasificaciones de /api/scan. Los
+        contadores de 'history' son los del worker que atiende la petición.
+        """
+        modes = self._backend.read_stats() if self._backend is not None else {}
+        combined = WindowStats()
+        for mode_stats in modes.values():
+            combined.merge(mode_stats)
+
+        return {
+            'window_size': Config.STATS_WINDOW,
+            **combined.to_dict(),
+            'modes': {mode: mode_stats.to_dict() for mode, mode_stats in sorted(modes.items())},
+            'history': {
+                'enabled': self.enabled,
+                'backend': Config.HISTORY_BACKEND,
+                'pid': os.getpid(),
+                'recorded': self.recorded,
+                'written': self.written,
+                'dropped': self.dropped,
+                'write_errors': self.write_errors,
+                'batches': self.batches,
+                'queue_size': self._queue.qsize()
+            }
+        }
+
+# Instancia global del servicio
+history_service = HistoryService()
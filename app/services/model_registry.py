@@ -0,0 +1,301 @@
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Modos de normalización soportados por el manifiesto
+NORMALIZATION_MODES = ('rescale', 'tf', 'torch', 'none')
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+class ModelNotFoundError(KeyError):
+    """El modelo solicitado no está registrado en el manifiesto"""
+
+class ModelUnavailableError(RuntimeError):
+    """El modelo está registrado pero su configuración impide servirlo"""
+
+@dataclass
+class ModelSpec:
+    """Entrada del manifiesto de modelos"""
+    name: str
+    url: str
+    path: str
+    labels: List[str]
+    input_size: Tuple[int, int] = (224, 224)
+    normalization: str = 'rescale'
+    sha256: Optional[str] = None
+    version: Optional[str] = None
+    unavailable_reason: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return self.unavailable_reason is None
+
+    def normalize(self, image_array: np.ndarray) -> np.ndarray:
+        """
+        Aplica la normalización del modelo a un array uint8 (..., H, W, 3)
+
+        Args:
+            image_array: Array de píxeles en el rango 0-255
+
+        Returns:
+            np.ndarray: Array float32 normalizado
+        """
+        # Una única copia a float32; el resto de operaciones se hacen en sitio
+        image_array = image_array.astype(np.float32)
+        if self.normalization == 'rescale':
+            image_array *= 1.0 / 255.0
+        elif self.normalization == 'tf':
+            image_array *= 1.0 / 127.5
+            image_array -= 1.0
+        elif self.normalization == 'torch':
+            image_array *= 1.0 / 255.0
+            image_array -= IMAGENET_MEAN
+            image_array /= IMAGENET_STD
+        return image_array
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'url': self.url,
+            'path': self.path,
+            'sha256': self.sha256,
+            'version': self.version,
+            'input_size': list(self.input_size),
+            'normalization': self.normalization,
+            'available_classes': self.labels,
+            'total_classes': len(self.labels),
+            'available': self.available,
+            'unavailable_reason': self.unavailable_reason
+        }
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _parse_spec(name: str, entry: Dict[str, Any], is_default: bool) -> ModelSpec:
+    """
+    Construye un ModelSpec a partir de una entrada del manifiesto
+
+    Las entradas del modelo por defecto pueden omitir 'url', 'path' y
+    'labels', en cuyo caso se usan MODEL_URL, MODEL_PATH y MODEL_LABELS del
+    entorno. Un modelo sin etiquetas se registra como no disponible: servir
+    etiquetas que no corresponden al modelo es peor que no servirlo, pero el
+    resto del servicio debe seguir funcionando.
+    """
+    url = entry.get('url') or (Config.MODEL_URL if is_default else None)
+    if not url:
+        raise ValueError(f"El modelo '{name}' no define 'url'")
+
+    path = entry.get('path') or (Config.MODEL_PATH if is_default else os.path.join('models', f'{name}.keras'))
+
+    labels = entry.get('labels') or (Config.MODEL_LABELS if is_default else None) or []
+    unavailable_reason = None
+    if not labels:
+        unavailable_reason = (
+            f"El modelo '{name}' no define 'labels'. Defina las clases del modelo, en el orden "
+            f"de sus salidas, en el manifiesto" + (" o en MODEL_LABELS" if is_default else "")
+        )
+        logger.error(f"❌ {unavailable_reason}")
+
+    input_size = entry.get('input_size', [224, 224])
+    if isinstance(input_size, int):
+        input_size = [input_size, input_size]
+    if len(input_size) != 2:
+        raise ValueError(f"'input_size' inválido para '{name}': {input_size}")
+
+    normalization = entry.get('normalization', 'rescale')
+    if normalization not in NORMALIZATION_MODES:
+        raise ValueError(
+            f"Normalización '{normalization}' no soportada para '{name}'. "
+            f"Opciones: {', '.join(NORMALIZATION_MODES)}"
+        )
+
+    return ModelSpec(
+        name=name,
+        url=url,
+        path=path,
+        labels=list(labels),
+        input_size=(int(input_size[0]), int(input_size[1])),
+        normalization=normalization,
+        sha256=entry.get('sha256'),
+        version=entry.get('version'),
+        unavailable_reason=unavailable_reason
+    )
+
+def load_manifest(manifest_path: str) -> Tuple[str, Dict[str, ModelSpec]]:
+    """
+    Lee el manifiesto de modelos
+
+    Si el archivo no existe se registra un único modelo a partir de
+    MODEL_URL, MODEL_PATH y MODEL_LABELS.
+
+    Args:
+        manifest_path: Ruta al archivo JSON del manifiesto
+
+    Returns:
+        Tuple[str, Dict[str, ModelSpec]]: (modelo_por_defecto, modelos)
+    """
+    if not os.path.exists(manifest_path):
+        logger.warning(f"Manifiesto no encontrado en {manifest_path}, usando MODEL_URL/MODEL_PATH")
+        name = os.path.splitext(os.path.basename(Config.MODEL_PATH))[0]
+        spec = _parse_spec(name, {}, is_default=True)
+        return name, {name: spec}
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    entries = manifest.get('models') or {}
+    if not entries:
+        raise ValueError(f"El manifiesto {manifest_path} no define modelos")
+
+    default_name = Config.DEFAULT_MODEL or manifest.get('default') or next(iter(entries))
+    if default_name not in entries:
+        raise ValueError(f"El modelo por defecto '{default_name}' no está en el manifiesto")
+
+    specs = {
+        name: _parse_spec(name, entry, is_default=(name == default_name))
+        for name, entry in entries.items()
+    }
+    logger.info(f"Manifiesto cargado: {len(specs)} modelo(s), por defecto '{default_name}'")
+    return default_name, specs
+
+@dataclass
+class _CacheEntry:
+    model: Any
+    size_bytes: int
+    loaded_at: float
+    last_used: float
+
+@dataclass
+class _ModelStats:
+    usage_count: int = 0
+    load_count: int = 0
+    eviction_count: int = 0
+    last_used: Optional[float] = None
+    last_size_bytes: Optional[int] = None
+
+class ModelCache:
+    """
+    Caché LRU de modelos cargados limitada por un presupuesto de memoria
+
+    Los modelos que superan el tiempo de inactividad configurado se liberan
+    en el siguiente acceso a la caché.
+    """
+
+    def __init__(self, max_bytes: int, idle_timeout: float):
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        Obtiene un modelo de la caché y lo marca como usado recientemente
+
+        Returns:
+            El modelo o None si no está cargado
+        """
+        with self._lock:
+            now = time.time()
+            self.evict_idle(now, keep=name)
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            self._entries.move_to_end(name)
+            entry.last_used = now
+            stats = self._stats.setdefault(name, _ModelStats())
+            stats.usage_count += 1
+            stats.last_used = now
+            return entry.model
+
+    def put(self, name: str, model: Any, size_bytes: int) -> None:
+        """
+        Inserta un modelo liberando los menos usados hasta respetar el presupuesto
+
+        Un modelo que por sí solo supera el presupuesto se mantiene igualmente,
+        ya que de otro modo no podría servirse.
+        """
+        with self._lock:
+            now = time.time()
+            self._entries.pop(name, None)
+            while self._entries and self.used_bytes + size_bytes > self.max_bytes:
+                evicted_name, _ = self._entries.popitem(last=False)
+                self._stats[evicted_name].eviction_count += 1
+                logger.info(f"♻️ Modelo '{evicted_name}' liberado por presupuesto de memoria")
+            if size_bytes > self.max_bytes:
+                logger.warning(
+                    f"⚠️ Modelo '{name}' ({size_bytes / 1024 ** 2:.1f}MB) supera el presupuesto "
+                    f"de la caché ({self.max_bytes / 1024 ** 2:.1f}MB)"
+                )
+            self._entries[name] = _CacheEntry(model=model, size_bytes=size_bytes, loaded_at=now, last_used=now)
+            stats = self._stats.setdefault(name, _ModelStats())
+            stats.load_count += 1
+            stats.last_size_bytes = size_bytes
+
+    def evict_idle(self, now: Optional[float] = None, keep: Optional[str] = None) -> List[str]:
+        """
+        Libera los modelos sin uso durante más de idle_timeout segundos
+
+        Args:
+            now: Marca de tiempo de referencia
+            keep: Nombre de un modelo que no debe liberarse
+
+        Returns:
+            List[str]: Nombres de los modelos liberados
+        """
+        if self.idle_timeout <= 0:
+            return []
+        now = now if now is not None else time.time()
+        with self._lock:
+            idle = [
+                name for name, entry in self._entries.items()
+                if name != keep and now - entry.last_used > self.idle_timeout
+            ]
+            for name in idle:
+                del self._entries[name]
+                self._stats[name].eviction_count += 1
+                logger.info(f"♻️ Modelo '{name}' liberado por inactividad")
+            return idle
+
+    def info(self, name: str) -> Dict[str, Any]:
+        """
+        Retorna el estado de carga y las estadísticas de uso de un modelo
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            stats = self._stats.get(name, _ModelStats())
+            return {
+                'loaded': entry is not None,
+                'size_bytes': entry.size_bytes if entry else stats.last_size_bytes,
+                'usage_count': stats.usage_count,
+                'load_count': stats.load_count,
+                'eviction_count': stats.eviction_count,
+                'last_used': stats.last_used
+            }
@@ -1,11 +1,19 @@
 import os
+import hashlib
 import logging
+import threading
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
 from PIL import Image
 import tensorflow as tf
 from config.config import Config
+from app.services.model_registry import (
+    ModelCache, ModelNotFoundError, ModelSpec, ModelUnavailableError, file_sha256, load_manifest
+)
+from app.utils.tiling_utils import (
+    compute_tile_boxes, compute_tile_layout, compute_tile_stride, extract_tiles, resize_for_tiling
+)
 
 # Configurar TensorFlow para compatibilidad
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -14,49 +22,93 @@ tf.config.experimental.enable_op_determinism()
 logger = logging.getLogger(__name__)
 
 class PredictionService:
-    """Servicio para realizar predicciones con el modelo de IA"""
+    """Servicio para realizar predicciones con los modelos de IA registrados"""
     
     def __init__(self):
-        self.model: Optional[tf.keras.Model] = None
-        self.class_names = [
-            'Zanahoria', 'Brócoli', 'Tomate', 'Lechuga', 'Pimiento',
-            'Cebolla', 'Papa', 'Apio', 'Pepino', 'Calabacín'
-        ]
-        self.is_model_loaded = False
-        self.model_url = os.environ.get('MODEL_URL', 'https://huggingface.co/risehit/tomato_leaf_classifier/resolve/main/models/tomato_leaf_classifier.keras')
+        self.default_model, self.models = load_manifest(Config.MODEL_MANIFEST_PATH)
+        self.cache = ModelCache(
+            max_bytes=Config.MODEL_CACHE_MAX_MB * 1024 * 1024,
+            idle_timeout=Config.MODEL_IDLE_TIMEOUT
+        )
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+    
+    @property
+    def is_model_loaded(self) -> bool:
+        """Indica si el modelo por defecto está cargado"""
+        return self.default_model in self.cache
+    
+    @property
+    def class_names(self) -> List[str]:
+        """Etiquetas del modelo por defecto"""
+        return self.models[self.default_model].labels
+    
+    def get_model_spec(self, model_name: Optional[str] = None) -> ModelSpec:
+        """
+        Obtiene la entrada del manifiesto de un modelo
         
-    def download_model(self) -> bool:
+        Args:
+            model_name: Nombre del modelo, None para el modelo por defecto
+            
+        Returns:
+            ModelSpec: Especificación del modelo
+        """
+        name = model_name or self.default_model
+        if name not in self.models:
+            raise ModelNotFoundError(name)
+        return self.models[name]
+    
+    def download_model(self, spec: ModelSpec) -> bool:
         """
-        Descarga el modelo desde Hugging Face si no existe localmente
+        Descarga el modelo desde su URL si no existe localmente
         
+        Si el manifiesto define 'sha256', un archivo local existente también
+        se verifica; si no coincide se vuelve a descargar, y el modelo no se
+        carga si la descarga tampoco coincide.
+        
+        Args:
+            spec: Especificación del modelo
+            
         Returns:
             bool: True si el modelo se descargó correctamente, False en caso contrario
         """
         try:
-            model_path = Config.MODEL_PATH
+            model_path = spec.path
             
             if os.path.exists(model_path):
-                logger.info(f"Modelo ya existe en {model_path}")
-                return True
+                if not spec.sha256:
+                    logger.info(f"Modelo ya existe en {model_path}")
+                    return True
+                local_sha256 = file_sha256(model_path)
+                if local_sha256.lower() == spec.sha256.lower():
+                    logger.info(f"Modelo ya existe en {model_path} (checksum verificado)")
+                    return True
+                logger.warning(
+                    f"⚠️ El archivo {model_path} no coincide con el checksum de '{spec.name}' "
+                    f"({local_sha256}), descargando de nuevo"
+                )
             
-            logger.info(f"📥 Descargando modelo desde Hugging Face...")
+            logger.info(f"📥 Descargando modelo '{spec.name}' desde {spec.url}...")
             
             # Crear directorio si no existe
-            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
             
             # Descargar modelo
-            response = requests.get(self.model_url, stream=True)
+            response = requests.get(spec.url, stream=True)
             response.raise_for_status()
             
             # Guardar modelo con progreso optimizado
             total_size = int(response.headers.get('content-length', 0))
             downloaded_size = 0
             last_log_size = 0
+            digest = hashlib.sha256()
+            tmp_path = f"{model_path}.part"
             
-            with open(model_path, 'wb') as f:
+            with open(tmp_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=32768):  # Chunks más grandes
                     if chunk:
                         f.write(chunk)
+                        digest.update(chunk)
                         downloaded_size += len(chunk)
                         
                         # Log progreso cada 25MB para reducir overhead
@@ -65,6 +117,13 @@ class PredictionService:
                             logger.info(f"📥 Descarga: {progress:.0f}%")
                             last_log_size = downloaded_size
             
+            # Verificar checksum antes de dejar el archivo en su ruta final
+            if spec.sha256 and digest.hexdigest().lower() != spec.sha256.lower():
+                os.remove(tmp_path)
+                logger.error(f"❌ Checksum inválido para '{spec.name}': {digest.hexdigest()}")
+                return False
+            
+            os.replace(tmp_path, model_path)
             logger.info(f"✅ Modelo descargado exitosamente en {model_path}")
             return True
             
@@ -72,76 +131,169 @@ class PredictionService:
             logger.error(f"❌ Error descargando modelo: {str(e)}")
             return False
     
-    def load_model(self) -> bool:
+    def _load_from_disk(self, model_path: str) -> Any:
+        """
+        Carga un modelo desde disco probando varios métodos por compatibilidad
+        """
+        try:
+            # Método 1: Carga estándar con tf.keras
+            model = tf.keras.models.load_model(model_path, compile=False)
+            logger.info("✅ Modelo cargado con tf.keras.models.load_model")
+        except Exception as e1:
+            logger.warning(f"⚠️ Fallo método 1: {str(e1)[:100]}...")
+            try:
+                # Método 2: Carga con custom_objects vacío
+                model = tf.keras.models.load_model(model_path, custom_objects={}, compile=False)
+                logger.info("✅ Modelo cargado con custom_objects={}")
+            except Exception as e2:
+                logger.warning(f"⚠️ Fallo método 2: {str(e2)[:100]}...")
+                try:
+                    # Método 3: Carga con SavedModel
+                    model = tf.saved_model.load(model_path)
+                    logger.info("✅ Modelo cargado con tf.saved_model.load")
+                except Exception as e3:
+                    logger.error(f"❌ Todos los métodos fallaron:")
+                    logger.error(f"   Método 1: {str(e1)[:100]}...")
+                    logger.error(f"   Método 2: {str(e2)[:100]}...")
+                    logger.error(f"   Método 3: {str(e3)[:100]}...")
+                    raise e1
+        return model
+    
+    @staticmethod
+    def _estimate_model_size(model: Any, model_path: str) -> int:
+        """
+        Estima la memoria ocupada por un modelo a partir de sus pesos
+        
+        Si el modelo no expone sus pesos se usa el tamaño del archivo en disco.
+        """
+        try:
+            size = sum(
+                int(np.prod(weight.shape)) * weight.dtype.size
+                for weight in model.weights
+            )
+            if size > 0:
+                return size
+        except Exception:
+            pass
+        return os.path.getsize(model_path)
+    
+    @staticmethod
+    def _validate_labels(model: Any, spec: ModelSpec) -> None:
         """
-        Carga el modelo de clasificación, descargándolo si es necesario
+        Verifica que la salida del modelo coincida con las etiquetas del manifiesto
+        """
+        output_shape = getattr(model, 'output_shape', None)
+        if not output_shape or isinstance(output_shape, list):
+            return
+        num_outputs = output_shape[-1]
+        if num_outputs is not None and num_outputs != len(spec.labels):
+            raise ValueError(
+                f"El modelo '{spec.name}' produce {num_outputs} clases pero el manifiesto "
+                f"define {len(spec.labels)} etiquetas"
+            )
+    
+    def load_model(self, model_name: Optional[str] = None) -> bool:
+        """
+        Carga un modelo en la caché, descargándolo si es necesario
         
+        Args:
+            model_name: Nombre del modelo, None para el modelo por defecto
+            
         Returns:
             bool: True si el modelo se cargó correctamente, False en caso contrario
         """
         try:
-            # Descargar modelo si no existe
-            if not self.download_model():
-                logger.error("No se pudo descargar el modelo")
-                return False
-            
-            model_path = Config.MODEL_PATH
-            
-            if not os.path.exists(model_path):
-                logger.error(f"Modelo no encontrado en {model_path} después de la descarga")
-                return False
-                
-            # Intentar múltiples métodos de carga para compatibilidad
-            try:
-                # Método 1: Carga estándar con tf.keras
-                self.model = tf.keras.models.load_model(model_path, compile=False)
-                logger.info("✅ Modelo cargado con tf.keras.models.load_model")
-            except Exception as e1:
-                logger.warning(f"⚠️ Fallo método 1: {str(e1)[:100]}...")
-                try:
-                    # Método 2: Carga con custom_objects vacío
-                    self.model = tf.keras.models.load_model(model_path, custom_objects={}, compile=False)
-                    logger.info("✅ Modelo cargado con custom_objects={}")
-                except Exception as e2:
-                    logger.warning(f"⚠️ Fallo método 2: {str(e2)[:100]}...")
-                    try:
-                        # Método 3: Carga con SavedModel
-                        self.model = tf.saved_model.load(model_path)
-                        logger.info("✅ Modelo cargado con tf.saved_model.load")
-                    except Exception as e3:
-                        logger.error(f"❌ Todos los métodos fallaron:")
-                        logger.error(f"   Método 1: {str(e1)[:100]}...")
-                        logger.error(f"   Método 2: {str(e2)[:100]}...")
-                        logger.error(f"   Método 3: {str(e3)[:100]}...")
-                        raise e1
-            self.is_model_loaded = True
-            logger.info(f"✅ Modelo cargado exitosamente desde {model_path}")
+            self.get_model(model_name)
             return True
-            
         except Exception as e:
             logger.error(f"❌ Error al cargar el modelo: {str(e)}")
             return False
     
-    def preprocess_image(self, image: Image.Image) -> np.ndarray:
+    def get_model(self, model_name: Optional[str] = None) -> Any:
+        """
+        Obtiene un modelo de la caché cargándolo en el primer uso
+        
+        Args:
+            model_name: Nombre del modelo, None para el modelo por defecto
+            
+        Returns:
+            El modelo cargado
+            
+        Raises:
+            ModelUnavailableError: Si el manifiesto no permite servir el modelo
+        """
+        spec = self.get_model_spec(model_name)
+        if not spec.available:
+            raise ModelUnavailableError(spec.unavailable_reason)
+        model = self.cache.get(spec.name)
+        if model is not None:
+            return model
+        
+        # Un lock por modelo evita cargas duplicadas en peticiones concurrentes
+        with self._lock:
+            load_lock = self._load_locks.setdefault(spec.name, threading.Lock())
+        
+        with load_lock:
+            model = self.cache.get(spec.name)
+            if model is not None:
+                return model
+            
+            if not self.download_model(spec):
+                raise RuntimeError(f"No se pudo descargar el modelo '{spec.name}'")
+            
+            if not os.path.exists(spec.path):
+                raise RuntimeError(f"Modelo no encontrado en {spec.path} después de la descarga")
+            
+            model = self._load_from_disk(spec.path)
+            self._validate_labels(model, spec)
+            size_bytes = self._estimate_model_size(model, spec.path)
+            self.cache.put(spec.name, model, size_bytes)
+            logger.info(f"✅ Modelo '{spec.name}' cargado exitosamente desde {spec.path} ({size_bytes / 1024 ** 2:.1f}MB)")
+            # Se retorna la referencia local: una carga concurrente de otro modelo
+            # podría haberlo liberado ya de la caché
+            return model
+    
+    def get_models_info(self) -> List[Dict[str, Any]]:
+        """
+        Lista los modelos registrados con su estado de carga y uso
+        
+        Returns:
+            List[Dict]: Información de cada modelo del manifiesto
+        """
+        self.cache.evict_idle()
+        return [
+            {
+                **spec.to_dict(),
+                **self.cache.info(name),
+                'default': name == self.default_model
+            }
+            for name, spec in self.models.items()
+        ]
+    
+    def preprocess_image(self, image: Image.Image, spec: Optional[ModelSpec] = None) -> np.ndarray:
         """
         Preprocesa la imagen para el modelo
         
         Args:
             image: Imagen PIL
+            spec: Especificación del modelo, None para el modelo por defecto
             
         Returns:
             np.ndarray: Imagen preprocesada como array numpy
         """
         try:
-            # Redimensionar a 224x224
-            image = image.resize((224, 224))
+            spec = spec or self.get_model_spec()
             
             # Convertir a RGB si es necesario
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
+            # Redimensionar al tamaño de entrada del modelo (PIL usa ancho x alto)
+            height, width = spec.input_size
+            image = image.resize((width, height))
+            
             # Convertir a array numpy y normalizar
-            image_array = np.array(image) / 255.0
+            image_array = spec.normalize(np.asarray(image))
             
             # Añadir dimensión del batch
             image_array = np.expand_dims(image_array, axis=0)
@@ -152,49 +304,152 @@ class PredictionService:
             logger.error(f"Error al preprocesar imagen: {str(e)}")
             raise
     
-    def predict(self, image: Image.Image) -> Dict[str, Any]:
+    def format_prediction(self, spec: ModelSpec, probabilities: np.ndarray) -> Dict[str, Any]:
+        """
+        Construye el resultado de una predicción a partir del vector de probabilidades
+        
+        Args:
+            spec: Especificación del modelo que produjo las probabilidades
+            probabilities: Vector de probabilidades por clase
+            
+        Returns:
+            Dict con la predicción, confianza y probabilidades por clase
+        """
+        predicted_class_index = int(np.argmax(probabilities))
+        confidence = float(probabilities[predicted_class_index])
+        
+        return {
+            'prediction': spec.labels[predicted_class_index],
+            'confidence': round(confidence * 100, 2),
+            'all_predictions': {
+                class_name: round(float(prob) * 100, 2)
+                for class_name, prob in zip(spec.labels, probabilities)
+            },
+            'model_used': True,
+            'model_name': spec.name
+        }
+    
+    @staticmethod
+    def _run_model(model: Any, batch: np.ndarray) -> np.ndarray:
+        """
+        Ejecuta el modelo sobre un batch ya preprocesado
+        
+        Se llama al modelo directamente en lugar de usar model.predict(), que
+        construye un pipeline de datos en cada llamada y domina la latencia
+        con batches pequeños.
+        """
+        return np.asarray(model(batch, training=False))
+    
+    def predict_probabilities(self, image: Image.Image, model_name: Optional[str] = None) -> Tuple[ModelSpec, np.ndarray]:
+        """
+        Obtiene el vector de probabilidades del modelo para una imagen
+        
+        Args:
+            image: Imagen PIL a clasificar
+            model_name: Nombre del modelo a usar, None para el modelo por defecto
+            
+        Returns:
+            Tuple[ModelSpec, np.ndarray]: (especificación del modelo, probabilidades)
+        """
+        spec = self.get_model_spec(model_name)
+        model = self.get_model(spec.name)
+        processed_image = self.preprocess_image(image, spec)
+        predictions = self._run_model(model, processed_image)
+        return spec, predictions[0]
+    
+    def predict(self, image: Image.Image, model_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Realiza una predicción sobre la imagen
         
         Args:
             image: Imagen PIL a clasificar
+            model_name: Nombre del modelo a usar, None para el modelo por defecto
             
         Returns:
             Dict con la predicción, confianza y otros datos
         """
-        logger.info(f"Iniciando predicción. Modelo cargado: {self.is_model_loaded}")
+        logger.info(f"Iniciando predicción con modelo '{model_name or self.default_model}'")
         
         try:
-            if self.is_model_loaded and self.model is not None:
-                logger.info("Usando modelo real para predicción")
-                processed_image = self.preprocess_image(image)
-                predictions = self.model.predict(processed_image, verbose=0)
-                
-                # Obtener la clase con mayor probabilidad
-                predicted_class_index = np.argmax(predictions[0])
-                confidence = float(predictions[0][predicted_class_index])
-                predicted_class = self.class_names[predicted_class_index]
-                
-                result = {
-                    'prediction': predicted_class,
-                    'confidence': round(confidence * 100, 2),
-                    'all_predictions': {
-                        class_name: round(float(prob) * 100, 2) 
-                        for class_name, prob in zip(self.class_names, predictions[0])
-                    },
-                    'model_used': True
-                }
-                logger.info(f"Predicción con modelo real completada: {predicted_class}")
-                return result
-            else:
-                # Error: modelo no disponible
-                logger.error("Modelo de IA no disponible - servicio no puede procesar la imagen")
-                raise Exception("Modelo de clasificación no disponible")
+            spec, probabilities = self.predict_probabilities(image, model_name)
+            result = self.format_prediction(spec, probabilities)
+            logger.info(f"Predicción con modelo real completada: {result['prediction']}")
+            return result
                 
         except Exception as e:
             logger.error(f"Error durante la predicción: {str(e)}")
             # Re-raise para que se maneje como error en routes
             raise
-            return self._simulate_prediction()
+
+    def predict_tiles(self, image: Image.Image, grid: Tuple[int, int], overlap: float,
+                      model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Clasifica una imagen grande dividiéndola en tiles solapados del tamaño del modelo
+        
+        Todos los tiles se procesan en una sola inferencia por batch y se
+        agregan en una distribución de etiquetas.
+        
+        Args:
+            image: Imagen PIL a clasificar
+            grid: Cuadrícula (filas, columnas) de tiles
+            overlap: Fracción de solapamiento entre tiles vecinos
+            model_name: Nombre del modelo a usar, None para el modelo por defecto
+            
+        Returns:
+            Dict con la predicción agregada, la predicción de cada tile y la distribución de etiquetas
+        """
+        spec = self.get_model_spec(model_name)
+        logger.info(f"Iniciando predicción por tiles {grid[0]}x{grid[1]} con modelo '{spec.name}'")
+        
+        try:
+            model = self.get_model(spec.name)
+            layout = compute_tile_layout(
+                image.size, spec.input_size, grid, compute_tile_stride(spec.input_size, overlap)
+            )
+            
+            canvas = resize_for_tiling(image, layout)
+            tiles = extract_tiles(canvas, spec.input_size, layout.stride)
+            
+            # Normalizar la vista produce directamente el batch contiguo
+            batch = spec.normalize(tiles).reshape(-1, *tiles.shape[2:])
+            probabilities = self._run_model(model, batch)
+            
+            boxes = compute_tile_boxes(grid, spec.input_size, layout)
+            
+            tile_results = []
+            predicted_indices = np.argmax(probabilities, axis=1)
+            for index, (tile_probabilities, predicted_index) in enumerate(zip(probabilities, predicted_indices)):
+                row, col = divmod(index, grid[1])
+                tile_results.append({
+                    'row': row,
+                    'col': col,
+                    'box': boxes[index],
+                    'prediction': spec.labels[predicted_index],
+                    'confidence': round(float(tile_probabilities[predicted_index]) * 100, 2)
+                })
+            
+            result = self.format_prediction(spec, probabilities.mean(axis=0))
+            counts = np.bincount(predicted_indices, minlength=len(spec.labels))
+            result.update({
+                'label_counts': {
+                    label: int(count) for label, count in zip(spec.labels, counts) if count > 0
+                },
+                'tiles': tile_results,
+                'tiling': {
+                    'grid': list(grid),
+                    'overlap': overlap,
+                    'stride': list(layout.stride),
+                    'tile_size': list(spec.input_size),
+                    'total_tiles': len(tile_results),
+                    'region': layout.region
+                }
+            })
+            logger.info(f"Predicción por tiles completada: {result['prediction']} ({len(tile_results)} tiles)")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error durante la predicción por tiles: {str(e)}")
+            raise
+
 # Instancia global del servicio
 prediction_service = PredictionService()
@@ -0,0 +1,396 @@
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from simple_websocket import ConnectionClosed
+from app.services.model_registry import ModelNotFoundError
+from app.services.history_service import history_service
+from app.utils.image_utils import decode_image_bytes
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class LatestFrameSlot:
+    """
+    Buffer de un solo frame: un frame nuevo reemplaza al pendiente
+
+    Así la inferencia siempre procesa el frame más reciente y los frames
+    intermedios se descartan cuando el modelo no alcanza al cliente.
+    """
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, frame_id: int, data: bytes) -> bool:
+        """
+        Deja un frame pendiente de procesar
+
+        Returns:
+            bool: True si se descartó un frame anterior aún no procesado
+        """
+        with self._condition:
+            dropped = self._frame is not None
+            self._frame = (frame_id, data)
+            self._condition.notify()
+            return dropped
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[int, bytes]]:
+        """
+        Espera y retira el frame pendiente
+
+        Returns:
+            (frame_id, datos) o None si el slot se cerró o se agotó el tiempo
+        """
+        with self._condition:
+            if self._frame is None and not self._closed:
+                self._condition.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+class TemporalSmoother:
+    """
+    Suavizado exponencial de las probabilidades entre frames consecutivos
+
+    Con factor 0 el suavizado está desactivado; valores cercanos a 1 dan
+    más peso a los frames anteriores. El hilo de recepción lo reconfigura
+    mientras el hilo de inferencia lo actualiza, por eso todo acceso al
+    estado pasa por un lock.
+    """
+
+    def __init__(self, factor: float = 0.0):
+        self._factor = factor
+        self._state: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def factor(self) -> float:
+        return self._factor
+
+    @property
+    def enabled(self) -> bool:
+        return self._factor > 0
+
+    def update(self, probabilities: np.ndarray) -> Tuple[np.ndarray, bool]:
+        """
+        Incorpora las probabilidades de un frame
+
+        Returns:
+            (probabilidades suavizadas, si el suavizado estaba activo)
+        """
+        with self._lock:
+            factor = self._factor
+            if factor <= 0 or self._state is None or self._state.shape != probabilities.shape:
+                self._state = probabilities.astype(np.float32)
+            else:
+                self._state = factor * self._state + (1.0 - factor) * probabilities
+            return self._state, factor > 0
+
+    def configure(self, factor: Optional[float] = None) -> None:
+        """Cambia el factor (si se indica) y descarta el estado acumulado"""
+        with self._lock:
+            if factor is not None:
+                self._factor = factor
+            self._state = None
+
+class StreamStats:
+    """Estadísticas de rendimiento de una conexión de streaming"""
+
+    def __init__(self, latency_window: int = 100):
+        self.started_at = time.time()
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_invalid = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def record_received(self, dropped: bool) -> None:
+        with self._lock:
+            self.frames_received += 1
+            if dropped:
+                self.frames_dropped += 1
+
+    def record_processed(self, latency_ms: float) -> None:
+        with self._lock:
+            self.frames_processed += 1
+            self._latencies.append(latency_ms)
+
+    def record_invalid(self) -> None:
+        with self._lock:
+            self.frames_invalid += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max(time.time() - self.started_at, 1e-6)
+            latencies = list(self._latencies)
+            return {
+                'elapsed_s': round(elapsed, 2),
+                'frames_received': self.frames_received,
+                'frames_processed': self.frames_processed,
+                'frames_dropped': self.frames_dropped,
+                'frames_invalid': self.frames_invalid,
+                'received_fps': round(self.frames_received / elapsed, 2),
+                'processed_fps': round(self.frames_processed / elapsed, 2),
+                'avg_latency_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p95_latency_ms': round(float(np.percentile(latencies, 95)), 2) if latencies else None
+            }
+
+class StreamSession:
+    """
+    Sesión de clasificación en streaming sobre una conexión WebSocket
+
+    El hilo de la conexión recibe mensajes y deja los frames en un
+    LatestFrameSlot; un hilo de inferencia procesa siempre el último frame
+    y envía el resultado. Los mensajes binarios son frames codificados
+    (JPEG/PNG); los mensajes de texto son JSON de control:
+
+        {"type": "frame", "image": "<base64>"}
+        {"type": "config", "model": "...", "smoothing": 0.6}
+        {"type": "stats"}
+    """
+
+    def __init__(self, ws: Any, model_name: Optional[str] = None, smoothing: float = 0.0):
+        # Import diferido: las utilidades de este módulo no dependen de TensorFlow
+        from app.services.prediction_service import prediction_service
+
+        self.prediction_service = prediction_service
+        self.ws = ws
+        self.model_name = model_name
+        self.smoother = TemporalSmoother(smoothing)
+        self.stats = StreamStats()
+        self._slot = LatestFrameSlot()
+        self._send_lock = threading.Lock()
+        self._next_frame_id = 0
+
+    def send(self, payload: Dict[str, Any]) -> None:
+        """Envía un mensaje JSON; el lock serializa los envíos de ambos hilos"""
+        with self._send_lock:
+            self.ws.send(json.dumps(payload))
+
+    def run(self) -> None:
+        """
+        Atiende la conexión hasta que el cliente la cierre
+        """
+        worker = threading.Thread(target=self._inference_loop, name='stream-inference', daemon=True)
+        worker.start()
+        try:
+            self.send({'type': 'ready', 'model': self.model_name or self.prediction_service.default_model,
+                       'smoothing': self.smoother.factor})
+            while True:
+                message = self.ws.receive()
+                if message is None:
+                    continue
+                self._handle_message(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            self._slot.close()
+            worker.join(timeout=5)
+            logger.info(f"Conexión de streaming cerrada: {self.stats.to_dict()}")
+
+    def _enqueue_frame(self, data: bytes) -> None:
+        self._next_frame_id += 1
+        dropped = self._slot.put(self._next_frame_id, data)
+        self.stats.record_received(dropped)
+
+    def _handle_message(self, message: Any) -> None:
+        if isinstance(message, bytes):
+            self._enqueue_frame(message)
+            return
+
+        try:
+            control = json.loads(message)
+        except ValueError:
+            control = None
+        if not isinstance(control, dict):
+            self.send({'type': 'error', 'error_code': 'INVALID_MESSAGE',
+                       'message': 'El mensaje debe ser un objeto JSON'})
+            return
+
+        message_type = control.get('type')
+        if message_type == 'frame':
+            if not isinstance(control.get('image'), str):
+                self.send({'type': 'error', 'error_code': 'INVALID_MESSAGE',
+                           'message': "'image' debe ser un frame codificado en base64"})
+                return
+            try:
+                self._enqueue_frame(base64.b64decode(control['image'], validate=True))
+            except (TypeError, ValueError):
+                self.stats.record_invalid()
+                self.send({'type': 'error', 'error_code': 'INVALID_IMAGE_FILE', 'message': 'Frame base64 inválido'})
+        elif message_type == 'config':
+            self._apply_config(control)
+        elif message_type == 'stats':
+            self.send({'type': 'stats', 'stats': self.stats.to_dict()})
+        else:
+            self.send({'type': 'error', 'error_code': 'INVALID_MESSAGE',
+                       'message': f"Tipo de mensaje no soportado: {message_type}"})
+
+    def _apply_config(self, control: Dict[str, Any]) -> None:
+        if 'model' in control:
+            if not isinstance(control['model'], str):
+                self.send({'type': 'error', 'error_code': 'INVALID_MESSAGE',
+                           'message': "'model' debe ser el nombre de un modelo"})
+                return
+            try:
+                spec = self.prediction_service.get_model_spec(control['model'])
+            except ModelNotFoundError:
+                self.send({'type': 'error', 'error_code': 'UNKNOWN_MODEL',
+                           'message': f"El modelo '{control['model']}' no está registrado"})
+                return
+            if not spec.available:
+                self.send({'type': 'error', 'error_code': 'MODEL_UNAVAILABLE',
+                           'message': spec.unavailable_reason})
+                return
+            self.model_name = control['model']
+            self.smoother.configure()
+
+        if 'smoothing' in control:
+            try:
+                self.smoother.configure(parse_smoothing(control['smoothing']))
+            except ValueError as e:
+                self.send({'type': 'error', 'error_code': 'INVALID_PARAMETER', 'message': str(e)})
+                return
+
+        self.send({'type': 'config', 'model': self.model_name or self.prediction_service.default_model,
+                   'smoothing': self.smoother.factor})
+
+    def _inference_loop(self) -> None:
+        while not self._slot.closed:
+            frame = self._slot.take(timeout=1.0)
+            if frame is None:
+                continue
+            frame_id, data = frame
+
+            try:
+                sent = self._process_frame(frame_id, data)
+            except Exception as e:
+                # Un error inesperado no debe dejar la conexión abierta sin resultados
+                logger.exception(f"Error inesperado procesando el frame {frame_id}: {str(e)}")
+                sent = self._safe_send({'type': 'error', 'frame': frame_id, 'error_code': 'SERVICE_ERROR',
+                                        'message': 'Error general del servicio'})
+            if not sent:
+                self._close_connection()
+                break
+
+    def _process_frame(self, frame_id: int, data: bytes) -> bool:
+        """
+        Clasifica un frame y envía el resultado
+
+        Returns:
+            bool: False si no se pudo enviar la respuesta al cliente
+        """
+        image = decode_image_bytes(data)
+        if image is None:
+            self.stats.record_invalid()
+            return self._safe_send({'type': 'error', 'frame': frame_id, 'error_code': 'INVALID_IMAGE_FILE',
+                                    'message': 'No se pudo decodificar el frame'})
+
+        start = time.perf_counter()
+        try:
+            spec, probabilities = self.prediction_service.predict_probabilities(image, self.model_name)
+        except Exception as e:
+            logger.error(f"Error durante la predicción en streaming: {str(e)}")
+            return self._safe_send({'type': 'error', 'frame': frame_id, 'error_code': 'PREDICTION_SERVICE_ERROR',
+                                    'message': 'Error en el servicio de predicción'})
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.stats.record_processed(latency_ms)
+
+        smoothed_probabilities, smoothed = self.smoother.update(probabilities)
+        result = self.prediction_service.format_prediction(spec, smoothed_probabilities)
+        result.update({
+            'type': 'prediction',
+            'frame': frame_id,
+            'smoothed': smoothed,
+            'latency_ms': round(latency_ms, 2),
+            'stats': self.stats.to_dict()
+        })
+        history_service.record(
+            result, hashlib.sha256(data).hexdigest(), latency_ms,
+            mode='stream', model_version=spec.version or spec.sha256
+        )
+        return self._safe_send(result)
+
+    def _safe_send(self, payload: Dict[str, Any]) -> bool:
+        try:
+            self.send(payload)
+            return True
+        except (ConnectionClosed, OSError):
+            return False
+
+    def _close_connection(self) -> None:
+        """Cierra el socket para que el hilo de recepción termine la sesión"""
+        self._slot.close()
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+class StreamLimiter:
+    """
+    Límite de conexiones de streaming simultáneas por worker
+
+    Cada conexión retiene un hilo de gunicorn durante toda su vida; sin un
+    límite, suficientes clientes de streaming dejarían al worker sin hilos
+    para atender peticiones HTTP.
+    """
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def acquire(self) -> bool:
+        """
+        Reserva un hueco para una conexión nueva
+
+        Returns:
+            bool: False si el worker ya atiende el máximo de conexiones
+        """
+        with self._lock:
+            if self._active >= self.max_connections:
+                return False
+            self._active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = max(self._active - 1, 0)
+
+def parse_smoothing(value: Any) -> float:
+    """
+    Valida el factor de suavizado temporal
+
+    Raises:
+        ValueError: Si no es un número en el rango [0, 1)
+    """
+    try:
+        factor = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Factor de suavizado inválido: {value}")
+    if not 0.0 <= factor < 1.0:
+        raise ValueError(f"El factor de suavizado debe estar en [0, 1): {factor}")
+    return factor
+
+# Instancia global del límite de conexiones
+stream_limiter = StreamLimiter(Config.STREAM_MAX_CONNECTIONS)
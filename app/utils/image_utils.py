@@ -1,4 +1,6 @@
 import os
+import io
+import hashlib
 import logging
 from typing import Tuple, Optional
 from PIL import Image
@@ -49,6 +51,23 @@ def validate_image_file(file: FileStorage) -> Tuple[bool, str]:
     
     return True, ""
 
+def compute_file_hash(file: FileStorage) -> str:
+    """
+    Calcula el hash SHA-256 del contenido de un archivo subido
+    
+    Args:
+        file: Archivo subido
+        
+    Returns:
+        str: Hash en hexadecimal; el stream queda de nuevo al inicio
+    """
+    digest = hashlib.sha256()
+    file.stream.seek(0)
+    for chunk in iter(lambda: file.stream.read(65536), b''):
+        digest.update(chunk)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
 def process_uploaded_image(file: FileStorage) -> Optional[Image.Image]:
     """
     Procesa y convierte un archivo subido a imagen PIL
@@ -83,6 +102,31 @@ def process_uploaded_image(file: FileStorage) -> Optional[Image.Image]:
         logger.error(f"Error al procesar imagen: {str(e)}")
         return None
 
+def decode_image_bytes(data: bytes) -> Optional[Image.Image]:
+    """
+    Decodifica una imagen recibida como bytes (por ejemplo, un frame de streaming)
+    
+    Args:
+        data: Contenido codificado de la imagen (JPEG, PNG, ...)
+        
+    Returns:
+        Image.Image o None si hay error
+    """
+    if not data:
+        return None
+    
+    if len(data) > Config.MAX_CONTENT_LENGTH:
+        logger.error(f"Frame demasiado grande: {len(data)} bytes")
+        return None
+    
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+    except Exception as e:
+        logger.error(f"Error al decodificar frame: {str(e)}")
+        return None
+
 def get_image_info(image: Image.Image) -> dict:
     """
     Obtiene información básica de una imagen
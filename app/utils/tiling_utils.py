@@ -0,0 +1,211 @@
+import math
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+def parse_tile_grid(value: Any) -> Tuple[int, int]:
+    """
+    Interpreta una cuadrícula de tiles en formato 'FILASxCOLUMNAS' (por ejemplo '3x4')
+
+    Args:
+        value: Cuadrícula como texto; un único número indica una cuadrícula cuadrada
+
+    Returns:
+        Tuple[int, int]: (filas, columnas)
+
+    Raises:
+        ValueError: Si el formato es inválido o supera TILE_MAX_TILES
+    """
+    try:
+        parts = str(value).lower().split('x')
+        if len(parts) == 1:
+            parts = parts * 2
+        rows, cols = (int(part) for part in parts)
+    except ValueError:
+        raise ValueError(f"Cuadrícula de tiles inválida: '{value}'. Formato esperado: FILASxCOLUMNAS")
+
+    if rows < 1 or cols < 1:
+        raise ValueError(f"La cuadrícula de tiles debe tener al menos 1x1: '{value}'")
+
+    if rows * cols > Config.TILE_MAX_TILES:
+        raise ValueError(f"La cuadrícula {rows}x{cols} supera el máximo de {Config.TILE_MAX_TILES} tiles")
+
+    return rows, cols
+
+def parse_tile_overlap(value: Any) -> float:
+    """
+    Valida la fracción de solapamiento entre tiles vecinos
+
+    Raises:
+        ValueError: Si no es un número en el rango [0, 0.9]
+    """
+    try:
+        overlap = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Solapamiento de tiles inválido: '{value}'")
+    if not 0.0 <= overlap <= 0.9:
+        raise ValueError(f"El solapamiento de tiles debe estar en [0, 0.9]: {overlap}")
+    return overlap
+
+def compute_tile_stride(tile_size: Tuple[int, int], overlap: float) -> Tuple[int, int]:
+    """
+    Calcula el paso (alto, ancho) entre tiles a partir del solapamiento
+    """
+    tile_height, tile_width = tile_size
+    return (
+        max(1, round(tile_height * (1.0 - overlap))),
+        max(1, round(tile_width * (1.0 - overlap)))
+    )
+
+@dataclass
+class TileLayout:
+    """
+    Disposición de la cuadrícula de tiles sobre una imagen concreta
+
+    canvas_size y stride están en píxeles del lienzo (alto, ancho); scale es
+    el número de píxeles originales por píxel del lienzo en cada eje (x, y) y
+    origin la esquina (x, y) del lienzo en la imagen original.
+    """
+    canvas_size: Tuple[int, int]
+    stride: Tuple[int, int]
+    scale: Tuple[float, float]
+    origin: Tuple[float, float]
+
+    @property
+    def region(self) -> List[int]:
+        """Región [x0, y0, x1, y1] de la imagen original cubierta por los tiles"""
+        x0, y0 = self.origin
+        return [
+            round(x0), round(y0),
+            round(x0 + self.canvas_size[1] * self.scale[0]), round(y0 + self.canvas_size[0] * self.scale[1])
+        ]
+
+def compute_tile_layout(image_size: Tuple[int, int], tile_size: Tuple[int, int], grid: Tuple[int, int],
+                        stride: Tuple[int, int]) -> TileLayout:
+    """
+    Ajusta la cuadrícula a la imagen completa con tiles cuadrados en píxeles originales
+
+    Se usa una única escala para ambos ejes, elegida para que la cuadrícula
+    con el paso solicitado cubra la imagen en el eje más ajustado; en el otro
+    eje el paso se reduce para que los tiles abarquen la imagen completa, de
+    modo que el solapamiento indicado es un mínimo. El paso se redondea a
+    píxeles enteros, así que la escala de cada eje puede diferir en menos de
+    un píxel del lienzo. Solo se recorta, de forma centrada, un eje con un
+    único tile cuando la imagen es más larga que el tile en ese eje.
+
+    Args:
+        image_size: Tamaño (ancho, alto) de la imagen original
+        tile_size: Tamaño (alto, ancho) de cada tile
+        grid: Cuadrícula (filas, columnas)
+        stride: Paso (alto, ancho) solicitado entre tiles
+
+    Returns:
+        TileLayout: Lienzo, paso efectivo, escala y origen
+    """
+    width, height = image_size
+    tile_height, tile_width = tile_size
+    canvas_height = tile_height + (grid[0] - 1) * stride[0]
+    canvas_width = tile_width + (grid[1] - 1) * stride[1]
+
+    # La cuadrícula cubre la imagen en ambos ejes, sin que ningún eje quede más corto que un tile
+    scale = min(max(width / canvas_width, height / canvas_height), width / tile_width, height / tile_height)
+
+    axes = []
+    for length, tile, count, step in ((height, tile_height, grid[0], stride[0]), (width, tile_width, grid[1], stride[1])):
+        if count == 1:
+            canvas, covered = tile, tile * scale
+        else:
+            step = max(1, math.floor((length / scale - tile) / (count - 1)))
+            canvas, covered = tile + (count - 1) * step, length
+        axes.append((canvas, step, covered / canvas, (length - covered) / 2))
+
+    (canvas_height, stride_y, scale_y, origin_y), (canvas_width, stride_x, scale_x, origin_x) = axes
+    if stride_y > tile_height or stride_x > tile_width:
+        logger.warning(
+            f"La cuadrícula {grid[0]}x{grid[1]} deja huecos entre tiles en una imagen de {width}x{height}; "
+            f"use más tiles en el eje largo"
+        )
+    return TileLayout(
+        canvas_size=(canvas_height, canvas_width),
+        stride=(stride_y, stride_x),
+        scale=(scale_x, scale_y),
+        origin=(origin_x, origin_y)
+    )
+
+def resize_for_tiling(image: Image.Image, layout: TileLayout) -> np.ndarray:
+    """
+    Redimensiona la región de la imagen cubierta por la cuadrícula al lienzo, en una sola operación
+
+    Para JPEG se usa draft() para decodificar directamente a una escala
+    reducida, lo que evita decodificar los 12 MP.
+
+    Returns:
+        np.ndarray: Array uint8 (alto, ancho, 3) del lienzo
+    """
+    canvas_height, canvas_width = layout.canvas_size
+    original_width, original_height = image.size
+
+    image.draft('RGB', (
+        math.ceil(original_width / layout.scale[0]), math.ceil(original_height / layout.scale[1])
+    ))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # draft() puede haber reducido la imagen; la región se expresa en sus coordenadas
+    draft_x = image.size[0] / original_width
+    draft_y = image.size[1] / original_height
+    x0, y0 = layout.origin
+    x1 = x0 + canvas_width * layout.scale[0]
+    y1 = y0 + canvas_height * layout.scale[1]
+    box = (x0 * draft_x, y0 * draft_y, x1 * draft_x, y1 * draft_y)
+    if image.size != (canvas_width, canvas_height):
+        image = image.resize((canvas_width, canvas_height), Image.BILINEAR, box=box)
+
+    return np.asarray(image)
+
+def compute_tile_boxes(grid: Tuple[int, int], tile_size: Tuple[int, int], layout: TileLayout) -> List[List[int]]:
+    """
+    Calcula la caja [x0, y0, x1, y1] de cada tile en píxeles de la imagen original
+
+    Args:
+        grid: Cuadrícula (filas, columnas)
+        tile_size: Tamaño (alto, ancho) de cada tile en el lienzo
+        layout: Disposición de la cuadrícula sobre la imagen
+
+    Returns:
+        List[List[int]]: Una caja por tile, en orden de filas
+    """
+    tile_height, tile_width = tile_size
+    scale_x, scale_y = layout.scale
+    boxes = []
+    for row in range(grid[0]):
+        for col in range(grid[1]):
+            x0 = layout.origin[0] + col * layout.stride[1] * scale_x
+            y0 = layout.origin[1] + row * layout.stride[0] * scale_y
+            boxes.append([
+                round(x0), round(y0),
+                round(x0 + tile_width * scale_x), round(y0 + tile_height * scale_y)
+            ])
+    return boxes
+
+def extract_tiles(canvas: np.ndarray, tile_size: Tuple[int, int], stride: Tuple[int, int]) -> np.ndarray:
+    """
+    Obtiene los tiles del lienzo como una vista, sin copiar píxeles
+
+    Args:
+        canvas: Array (alto, ancho, canales)
+        tile_size: Tamaño (alto, ancho) de cada tile
+        stride: Paso (alto, ancho) entre tiles
+
+    Returns:
+        np.ndarray: Vista de solo lectura con forma (filas, columnas, alto, ancho, canales)
+    """
+    tile_height, tile_width = tile_size
+    windows = sliding_window_view(canvas, (tile_height, tile_width, canvas.shape[2]))
+    return windows[::stride[0], ::stride[1], 0]
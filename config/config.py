@@ -11,8 +11,39 @@ class Config:
     
     # Configuración del modelo
     MODEL_PATH = os.environ.get('MODEL_PATH', 'models/tomato_classifier.keras')
+    MODEL_URL = os.environ.get('MODEL_URL', 'https://huggingface.co/risehit/tomato_leaf_classifier/resolve/main/models/tomato_leaf_classifier.keras')
+    # Clases del modelo por defecto, en el orden de sus salidas (si el manifiesto no las define)
+    MODEL_LABELS = [label.strip() for label in os.environ.get('MODEL_LABELS', '').split(',') if label.strip()]
+    MODEL_MANIFEST_PATH = os.environ.get('MODEL_MANIFEST_PATH', 'config/models.json')
+    DEFAULT_MODEL = os.environ.get('DEFAULT_MODEL')  # Por defecto el indicado en el manifiesto
+    MODEL_CACHE_MAX_MB = int(os.environ.get('MODEL_CACHE_MAX_MB', 1024))
+    MODEL_IDLE_TIMEOUT = int(os.environ.get('MODEL_IDLE_TIMEOUT', 1800))  # Segundos, 0 desactiva
     ALLOWED_EXTENSIONS = set(os.environ.get('ALLOWED_EXTENSIONS', 'jpg,jpeg,png,gif').split(','))
     
+    # Configuración de clasificación por tiles
+    TILE_DEFAULT_GRID = os.environ.get('TILE_DEFAULT_GRID', '3x3')
+    TILE_DEFAULT_OVERLAP = float(os.environ.get('TILE_DEFAULT_OVERLAP', 0.25))
+    TILE_MAX_TILES = int(os.environ.get('TILE_MAX_TILES', 64))
+    
+    # Configuración del historial de clasificaciones
+    HISTORY_ENABLED = os.environ.get('HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    HISTORY_BACKEND = os.environ.get('HISTORY_BACKEND', 'sqlite')
+    HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', 'data/history.db')
+    HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 10000))
+    HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 500))
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 1.0))  # Segundos
+    HISTORY_TOP_K = int(os.environ.get('HISTORY_TOP_K', 3))
+    STATS_WINDOW = int(os.environ.get('STATS_WINDOW', 1000))  # Clasificaciones por modo en los agregados de /api/stats
+    
+    # Configuración de streaming (WebSocket)
+    STREAM_DEFAULT_SMOOTHING = float(os.environ.get('STREAM_DEFAULT_SMOOTHING', 0.0))
+    # Cada conexión ocupa un hilo de gunicorn mientras está abierta
+    STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 16))
+    SOCK_SERVER_OPTIONS = {
+        'ping_interval': int(os.environ.get('STREAM_PING_INTERVAL', 25)),
+        'max_message_size': MAX_CONTENT_LENGTH
+    }
+    
     # Configuración del servidor
     HOST = os.environ.get('HOST', '127.0.0.1')
     PORT = int(os.environ.get('PORT', 5000))
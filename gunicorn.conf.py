@@ -8,8 +8,16 @@ bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
 # Workers - Número de procesos worker
 workers = int(os.environ.get('WEB_CONCURRENCY', 2))
 
-# Worker class
-worker_class = "sync"
+# Worker class - gthread permite conexiones WebSocket de larga duración (/api/stream)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Threads por worker (número de conexiones simultáneas por proceso). Cada
+# conexión de /api/stream ocupa un hilo mientras está abierta, así que por
+# defecto se reservan 16 hilos para HTTP además de STREAM_MAX_CONNECTIONS
+threads = int(os.environ.get(
+    'GUNICORN_THREADS',
+    int(os.environ.get('STREAM_MAX_CONNECTIONS', 16)) + 16
+))
 
 # Worker connections
 worker_connections = 1000
@@ -21,8 +29,9 @@ keepalive = 2
 # Preload app
 preload_app = True
 
-# Max requests per worker
-max_requests = 1000
+# Max requests per worker (0 desactiva el reciclado). Al reciclar un worker
+# se cierran sus conexiones de streaming y los clientes deben reconectarse
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
 max_requests_jitter = 100
 
 # Logging
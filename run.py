@@ -27,7 +27,9 @@ def main():
     print("📡 Endpoints disponibles:")
     print("   GET  /api/ping      - Health check")
     print("   POST /api/scan      - Clasificar vegetal")
+    print("   WS   /api/stream    - Clasificación en streaming")
     print("   GET  /api/model/info - Información del modelo")
+    print("   GET  /api/stats     - Estadísticas de clasificaciones")
     print("=" * 50)
     
     try:
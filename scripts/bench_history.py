@@ -0,0 +1,108 @@
+"""
+Benchmark del historial de clasificaciones
+
+Mide el coste de record() en el camino de la petición y el throughput
+sostenido de inserción del hilo escritor, frente a una inserción síncrona
+con commit por registro.
+
+Uso:
+    python scripts/bench_history.py --records 50000 --producers 4
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.history_service import HistoryRecord, HistoryService, SQLiteHistoryBackend
+
+LABELS = ['Zanahoria', 'Brócoli', 'Tomate', 'Lechuga', 'Pimiento', 'Cebolla', 'Papa', 'Apio', 'Pepino', 'Calabacín']
+
+def fake_result() -> dict:
+    """Resultado con la misma forma que el de PredictionService"""
+    weights = [random.random() for _ in LABELS]
+    total = sum(weights)
+    all_predictions = {label: round(weight / total * 100, 2) for label, weight in zip(LABELS, weights)}
+    prediction = max(all_predictions, key=all_predictions.get)
+    return {
+        'prediction': prediction,
+        'confidence': all_predictions[prediction],
+        'all_predictions': all_predictions,
+        'model_name': 'benchmark'
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark del historial de clasificaciones')
+    parser.add_argument('--records', type=int, default=20000, help='Registros a insertar')
+    parser.add_argument('--producers', type=int, default=1, help='Hilos que llaman a record() en paralelo')
+    parser.add_argument('--batch-size', type=int, default=500, help='Registros por transacción')
+    parser.add_argument('--queue-size', type=int, help='Capacidad de la cola (por defecto todos los registros, sin descartes)')
+    parser.add_argument('--sync-records', type=int, default=1000, help='Registros para la referencia síncrona')
+    args = parser.parse_args()
+
+    results = [fake_result() for _ in range(1000)]
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(1000)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Referencia: un INSERT + commit por registro dentro de la petición
+        sync_backend = SQLiteHistoryBackend(os.path.join(tmp_dir, 'sync.db'))
+        start = time.perf_counter()
+        for i in range(args.sync_records):
+            result = results[i % len(results)]
+            sync_backend.write_batch([HistoryRecord(
+                created_at=time.time(), image_hash=hashes[i % len(hashes)], model_name='benchmark',
+                model_version=None, mode='single', prediction=result['prediction'],
+                confidence=result['confidence'], top_k=[], latency_ms=10.0
+            )])
+        sync_elapsed = time.perf_counter() - start
+        sync_backend.close()
+
+        service = HistoryService(
+            backend=SQLiteHistoryBackend(os.path.join(tmp_dir, 'history.db')),
+            enabled=True,
+            queue_size=args.queue_size or args.records,
+            batch_size=args.batch_size,
+            flush_interval=0.5
+        )
+        per_producer = args.records // args.producers
+        record_times = []
+
+        def producer(offset: int) -> None:
+            start = time.perf_counter()
+            for i in range(per_producer):
+                index = (offset + i) % len(results)
+                service.record(results[index], hashes[index], random.uniform(5, 50))
+            record_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=producer, args=(i * per_producer,)) for i in range(args.producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        enqueue_elapsed = time.perf_counter() - start
+        service.flush()
+        total_elapsed = time.perf_counter() - start
+        service.close()
+
+        stats = service.get_stats()
+        total = per_producer * args.producers
+        print("🗃️  Benchmark del historial")
+        print("=" * 60)
+        print(f"Síncrono (commit por registro): {args.sync_records / sync_elapsed:10.0f} registros/s "
+              f"({sync_elapsed / args.sync_records * 1e6:.0f} µs/registro)")
+        print(f"record() en la petición:        {total / enqueue_elapsed:10.0f} registros/s "
+              f"({sum(record_times) / total * 1e6:.1f} µs/registro)")
+        print(f"Escritura sostenida en batches: {stats['history']['written'] / total_elapsed:10.0f} registros/s")
+        print("=" * 60)
+        print(f"Escritos: {stats['history']['written']}  Descartados: {stats['history']['dropped']}  "
+              f"Batches: {stats['history']['batches']}  Errores: {stats['history']['write_errors']}")
+        print(f"Latencia p50/p99 en la ventana: {stats['latency_ms']['p50']}/{stats['latency_ms']['p99']} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de la clasificación por tiles
+
+Mide tiles por segundo de la decodificación, de la extracción con vistas de
+numpy frente a recortes PIL por tile y, opcionalmente, de la inferencia
+por batch completa.
+
+Uso:
+    python scripts/bench_tiling.py foto.jpg --grid 4x4 --overlap 0.25
+    python scripts/bench_tiling.py foto.jpg --grid 6x8 --with-model
+"""
+import io
+import os
+import sys
+import time
+import argparse
+from typing import Callable
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_registry import load_manifest
+from app.utils.tiling_utils import (
+    compute_tile_layout, compute_tile_stride, extract_tiles, parse_tile_grid, resize_for_tiling
+)
+from config.config import Config
+
+def bench(label: str, func: Callable[[], int], iterations: int) -> None:
+    """Ejecuta func varias veces y reporta el tiempo medio y los tiles por segundo"""
+    func()  # Calentamiento
+    start = time.perf_counter()
+    tiles = 0
+    for _ in range(iterations):
+        tiles += func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed / iterations * 1000:8.1f} ms/imagen {tiles / elapsed:10.1f} tiles/s")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark de la clasificación por tiles')
+    parser.add_argument('image', help='Imagen de alta resolución a dividir')
+    parser.add_argument('--grid', default=Config.TILE_DEFAULT_GRID, help='Cuadrícula FILASxCOLUMNAS')
+    parser.add_argument('--overlap', type=float, default=Config.TILE_DEFAULT_OVERLAP, help='Solapamiento entre tiles')
+    parser.add_argument('--iterations', type=int, default=10, help='Repeticiones por medición')
+    parser.add_argument('--model', help='Modelo del manifiesto (por defecto el modelo por defecto)')
+    parser.add_argument('--with-model', action='store_true', help='Incluir la inferencia por batch con el modelo real')
+    args = parser.parse_args()
+
+    default_model, models = load_manifest(Config.MODEL_MANIFEST_PATH)
+    spec = models[args.model or default_model]
+    grid = parse_tile_grid(args.grid)
+    tile_height, tile_width = spec.input_size
+
+    with open(args.image, 'rb') as f:
+        data = f.read()
+
+    def open_image() -> Image.Image:
+        return Image.open(io.BytesIO(data))
+
+    layout = compute_tile_layout(open_image().size, spec.input_size, grid,
+                                 compute_tile_stride(spec.input_size, args.overlap))
+    stride = layout.stride
+    canvas = resize_for_tiling(open_image(), layout)
+    canvas_image = Image.fromarray(canvas)
+    total_tiles = grid[0] * grid[1]
+
+    def decode_and_resize() -> int:
+        resize_for_tiling(open_image(), layout)
+        return total_tiles
+
+    def decode_and_resize_full() -> int:
+        # Referencia sin draft(): decodifica la imagen a resolución completa
+        image = open_image().convert('RGB')
+        image.resize((canvas.shape[1], canvas.shape[0]), Image.BILINEAR, box=tuple(layout.region))
+        return total_tiles
+
+    def tiles_with_views() -> int:
+        tiles = extract_tiles(canvas, spec.input_size, stride)
+        batch = spec.normalize(tiles).reshape(-1, *tiles.shape[2:])
+        return batch.shape[0]
+
+    def tiles_with_pil_crops() -> int:
+        crops = [
+            np.asarray(canvas_image.crop((col * stride[1], row * stride[0],
+                                          col * stride[1] + tile_width, row * stride[0] + tile_height)))
+            for row in range(grid[0]) for col in range(grid[1])
+        ]
+        batch = np.stack([spec.normalize(crop) for crop in crops])
+        return batch.shape[0]
+
+    image = open_image()
+    print("🧩 Benchmark de tiles")
+    print("=" * 70)
+    print(f"Imagen: {image.size[0]}x{image.size[1]}  Cuadrícula: {grid[0]}x{grid[1]}  "
+          f"Tile: {tile_height}x{tile_width}  Paso: {stride[0]}x{stride[1]}")
+    print("=" * 70)
+    bench("Decodificación + redimensionado", decode_and_resize, args.iterations)
+    bench("Decodificación completa (sin draft)", decode_and_resize_full, args.iterations)
+    bench("Tiles con vistas numpy", tiles_with_views, args.iterations)
+    bench("Tiles con recortes PIL", tiles_with_pil_crops, args.iterations)
+
+    if args.with_model:
+        from app.services.prediction_service import prediction_service
+
+        if not prediction_service.load_model(spec.name):
+            print("❌ No se pudo cargar el modelo")
+            sys.exit(1)
+
+        def tiles_end_to_end() -> int:
+            result = prediction_service.predict_tiles(open_image(), grid, args.overlap, spec.name)
+            return result['tiling']['total_tiles']
+
+        bench("Extracción + inferencia por batch", tiles_end_to_end, args.iterations)
+
+if __name__ == '__main__':
+    main()
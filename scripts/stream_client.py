@@ -0,0 +1,135 @@
+"""
+Cliente de prueba de carga para el endpoint de streaming /api/stream
+
+Abre una o varias conexiones WebSocket, envía frames a una tasa fija y
+reporta el throughput y la latencia observados desde el cliente.
+
+Uso:
+    python scripts/stream_client.py imagen.jpg --fps 15 --connections 4 --duration 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import Any, Dict, List
+import numpy as np
+from simple_websocket import Client, ConnectionClosed
+
+def run_connection(url: str, frames: List[bytes], fps: float, duration: float, results: Dict[str, Any]) -> None:
+    """
+    Ejecuta una conexión: un hilo envía frames y el hilo actual lee resultados
+    """
+    ws = Client.connect(url)
+    sent_at: Dict[int, float] = {}
+    latencies: List[float] = []
+    errors = 0
+    server_stats: Dict[str, Any] = {}
+    stop = threading.Event()
+
+    def sender() -> None:
+        interval = 1.0 / fps
+        frame_id = 0
+        next_send = time.perf_counter()
+        try:
+            while not stop.is_set():
+                frame_id += 1
+                sent_at[frame_id] = time.perf_counter()
+                ws.send(frames[frame_id % len(frames)])
+                next_send += interval
+                time.sleep(max(0.0, next_send - time.perf_counter()))
+        except (ConnectionClosed, OSError):
+            pass
+        finally:
+            results['frames_sent'] = frame_id
+
+    sender_thread = threading.Thread(target=sender, daemon=True)
+    end = time.perf_counter() + duration
+    sender_thread.start()
+    try:
+        while time.perf_counter() < end:
+            message = ws.receive(timeout=0.5)
+            if message is None:
+                continue
+            payload = json.loads(message)
+            if payload.get('type') == 'prediction':
+                # Los ids de frame del servidor coinciden con el orden de envío
+                sent = sent_at.get(payload['frame'])
+                if sent is not None:
+                    latencies.append((time.perf_counter() - sent) * 1000)
+                server_stats = payload.get('stats', server_stats)
+            elif payload.get('type') == 'error':
+                errors += 1
+    except ConnectionClosed as e:
+        results['closed'] = f"{e.reason} {e.message}"
+    finally:
+        stop.set()
+        sender_thread.join()
+        try:
+            ws.close()
+        except ConnectionClosed:
+            pass
+
+    results.update({
+        'predictions': len(latencies),
+        'errors': errors,
+        'client_avg_latency_ms': float(np.mean(latencies)) if latencies else None,
+        'client_p95_latency_ms': float(np.percentile(latencies, 95)) if latencies else None,
+        'server_stats': server_stats
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Prueba de carga del streaming de clasificación')
+    parser.add_argument('images', nargs='+', help='Imágenes a enviar como frames (se envían en ciclo)')
+    parser.add_argument('--url', default='ws://127.0.0.1:5000/api/stream', help='URL del endpoint WebSocket')
+    parser.add_argument('--fps', type=float, default=15.0, help='Frames por segundo enviados por conexión')
+    parser.add_argument('--connections', type=int, default=1, help='Número de conexiones simultáneas')
+    parser.add_argument('--duration', type=float, default=10.0, help='Duración de la prueba en segundos')
+    parser.add_argument('--model', help='Modelo del manifiesto a usar')
+    parser.add_argument('--smoothing', type=float, help='Factor de suavizado temporal [0, 1)')
+    args = parser.parse_args()
+
+    frames = []
+    for path in args.images:
+        if not os.path.exists(path):
+            print(f"❌ Imagen no encontrada: {path}")
+            sys.exit(1)
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+
+    query = [f"{key}={value}" for key, value in (('model', args.model), ('smoothing', args.smoothing)) if value is not None]
+    url = args.url + ('?' + '&'.join(query) if query else '')
+
+    results: List[Dict[str, Any]] = [{} for _ in range(args.connections)]
+    threads = [
+        threading.Thread(target=run_connection, args=(url, frames, args.fps, args.duration, results[i]))
+        for i in range(args.connections)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print("📡 Prueba de streaming")
+    print("=" * 50)
+    for i, result in enumerate(results):
+        stats = result.get('server_stats', {})
+        avg = result.get('client_avg_latency_ms')
+        print(f"Conexión {i}: enviados={result.get('frames_sent', 0)} "
+              f"predicciones={result.get('predictions', 0)} "
+              f"descartados={stats.get('frames_dropped', 0)} "
+              f"errores={result.get('errors', 0)} "
+              f"latencia_media={f'{avg:.1f}ms' if avg is not None else '-'}")
+        if 'closed' in result:
+            print(f"   ⚠️ Conexión cerrada por el servidor: {result['closed']}")
+    total_sent = sum(r.get('frames_sent', 0) for r in results)
+    total_predictions = sum(r.get('predictions', 0) for r in results)
+    print("=" * 50)
+    print(f"Frames enviados:  {total_sent} ({total_sent / elapsed:.1f}/s)")
+    print(f"Predicciones:     {total_predictions} ({total_predictions / elapsed:.1f}/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+from collections import Counter
+import pytest
+from app.services.history_service import (
+    HistoryBackend, HistoryRecord, HistoryService, SQLiteHistoryBackend, confidence_bucket, create_backend
+)
+
+def make_record(prediction: str, confidence: float = 50.0, latency_ms: float = 10.0,
+                mode: str = 'single', model_name: str = 'model') -> HistoryRecord:
+    return HistoryRecord(
+        created_at=time.time(), image_hash='hash', model_name=model_name, model_version=None, mode=mode,
+        prediction=prediction, confidence=confidence, top_k=[[prediction, confidence]], latency_ms=latency_ms
+    )
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteHistoryBackend(str(tmp_path / 'history.db'), window=3)
+    yield backend
+    backend.close()
+
+def test_confidence_bucket():
+    assert confidence_bucket(0) == 0
+    assert confidence_bucket(9.99) == 0
+    assert confidence_bucket(10) == 1
+    assert confidence_bucket(99.9) == 9
+    assert confidence_bucket(100) == 9
+
+def test_window_decrements_counters_on_evict(backend):
+    backend.write_batch([make_record('a', 95, 1.0), make_record('b', 15, 2.0)])
+    backend.write_batch([make_record('a', 95, 3.0), make_record('c', 55, 4.0)])
+
+    stats = backend.read_stats()['single']
+
+    # Ventana de 3: el primer 'a' (95%, 1 ms) ha salido
+    assert stats.class_counts == {'a': 1, 'b': 1, 'c': 1}
+    assert stats.model_counts == {'model': 3}
+    assert stats.confidence_histogram[9] == 1
+    assert stats.confidence_histogram[1] == 1
+    assert stats.confidence_histogram[5] == 1
+    assert sorted(stats.latencies) == [2.0, 3.0, 4.0]
+
+def test_window_drops_classes_that_leave(backend):
+    backend.write_batch([make_record('a')])
+    backend.write_batch([make_record('b'), make_record('b'), make_record('b')])
+
+    assert backend.read_stats()['single'].class_counts == {'b': 3}
+
+def test_batch_larger_than_window(backend):
+    backend.write_batch([make_record(label) for label in 'abcde'])
+
+    stats = backend.read_stats()['single']
+    assert stats.class_counts == {'c': 1, 'd': 1, 'e': 1}
+    assert stats.size == 3
+
+def test_windows_are_kept_per_mode(backend):
+    backend.write_batch([make_record('a', mode='single')])
+    backend.write_batch([make_record('s', mode='stream') for _ in range(10)])
+
+    stats = backend.read_stats()
+    assert stats['single'].class_counts == {'a': 1}
+    assert stats['stream'].class_counts == {'s': 3}
+
+def test_counters_match_window_and_history(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    backend = SQLiteHistoryBackend(db_path, window=20)
+    labels = 'abcd'
+    for batch in range(10):
+        backend.write_batch([make_record(labels[(batch * 7 + i) % 4], confidence=(batch * 13 + i) % 100)
+                             for i in range(batch + 1)])
+    stats = backend.read_stats()['single']
+    backend.close()
+
+    connection = sqlite3.connect(db_path)
+    latest = connection.execute(
+        'SELECT prediction FROM scan_history ORDER BY id DESC LIMIT 20'
+    ).fetchall()
+    total = connection.execute('SELECT COUNT(*) FROM scan_history').fetchone()[0]
+    connection.close()
+
+    assert total == sum(range(1, 11))
+    assert stats.class_counts == dict(Counter(row[0] for row in latest))
+    assert sum(stats.confidence_histogram) == 20
+
+def test_read_stats_on_empty_database(backend):
+    assert backend.read_stats() == {}
+    # Leer no crea la base de datos
+    assert not os.path.exists(backend.db_path)
+
+def test_read_stats_before_stats_tables_exist(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    connection = sqlite3.connect(db_path)
+    connection.execute('CREATE TABLE scan_history (id INTEGER PRIMARY KEY)')
+    connection.close()
+
+    backend = SQLiteHistoryBackend(db_path)
+    assert backend.read_stats() == {}
+
+    tables = {row[0] for row in sqlite3.connect(db_path).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'scan_history'}
+
+def test_read_stats_reuses_connection_and_sees_new_batches(backend):
+    backend.write_batch([make_record('a')])
+    assert backend.read_stats()['single'].class_counts == {'a': 1}
+    connection = backend._read_connection()
+
+    backend.write_batch([make_record('b')])
+
+    assert backend.read_stats()['single'].class_counts == {'a': 1, 'b': 1}
+    assert backend._read_connection() is connection
+
+def test_history_backend_is_abstract():
+    with pytest.raises(TypeError):
+        HistoryBackend()
+
+def test_create_backend_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        create_backend('unknown')
+
+def test_service_stats_combine_modes(backend):
+    service = HistoryService(backend=backend, enabled=True, queue_size=100, batch_size=10, flush_interval=0.05)
+    result = {'prediction': 'a', 'confidence': 80.0, 'all_predictions': {'a': 80.0, 'b': 20.0}, 'model_name': 'model'}
+    service.record(result, 'hash', 5.0, mode='single')
+    service.record(result, 'hash', 7.0, mode='tiles')
+    service.flush()
+    stats = service.get_stats()
+    service.close()
+
+    assert stats['records_in_window'] == 2
+    assert stats['class_counts'] == {'a': 2}
+    assert set(stats['modes']) == {'single', 'tiles'}
+    assert stats['modes']['tiles']['latency_ms']['max'] == 7.0
+    assert stats['history']['written'] == 2
+
+class _MemoryBackend(HistoryBackend):
+    def __init__(self):
+        self.records = []
+
+    def write_batch(self, records):
+        self.records.extend(records)
+
+    def read_stats(self):
+        return {}
+
+def test_service_restarts_dead_writer():
+    backend = _MemoryBackend()
+    service = HistoryService(backend=backend, enabled=True, queue_size=100, batch_size=10, flush_interval=0.05)
+    result = {'prediction': 'a', 'confidence': 80.0, 'all_predictions': {'a': 80.0}, 'model_name': 'model'}
+    service.record(result, 'hash', 1.0)
+    service.flush()
+    service.close()
+    assert not service._writer.is_alive()
+
+    service.record(result, 'hash', 1.0)
+    service.flush()
+    service.close()
+    assert len(backend.records) == 2
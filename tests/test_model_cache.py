@@ -0,0 +1,68 @@
+import time
+from app.services import model_registry
+from app.services.model_registry import ModelCache
+
+def test_put_evicts_least_recently_used_over_budget():
+    cache = ModelCache(max_bytes=100, idle_timeout=0)
+    cache.put('a', 'model-a', 40)
+    cache.put('b', 'model-b', 40)
+    assert cache.get('a') == 'model-a'  # 'b' pasa a ser el menos usado
+
+    cache.put('c', 'model-c', 40)
+
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.used_bytes == 80
+    assert cache.info('b')['eviction_count'] == 1
+    assert cache.info('b')['loaded'] is False
+
+def test_put_keeps_model_larger_than_budget():
+    cache = ModelCache(max_bytes=100, idle_timeout=0)
+    cache.put('a', 'model-a', 40)
+    cache.put('big', 'model-big', 150)
+
+    assert 'big' in cache
+    assert 'a' not in cache
+    assert cache.used_bytes == 150
+
+def test_put_replaces_existing_entry():
+    cache = ModelCache(max_bytes=100, idle_timeout=0)
+    cache.put('a', 'old', 60)
+    cache.put('a', 'new', 60)
+
+    assert cache.get('a') == 'new'
+    assert cache.used_bytes == 60
+    assert cache.info('a')['load_count'] == 2
+
+def test_evict_idle_respects_timeout_and_keep():
+    cache = ModelCache(max_bytes=1000, idle_timeout=10)
+    cache.put('a', 'model-a', 10)
+    cache.put('b', 'model-b', 10)
+    now = time.time()
+
+    assert cache.evict_idle(now=now + 5) == []
+    assert cache.evict_idle(now=now + 11, keep='b') == ['a']
+    assert 'b' in cache
+    assert cache.info('a')['eviction_count'] == 1
+
+def test_evict_idle_disabled_with_zero_timeout():
+    cache = ModelCache(max_bytes=1000, idle_timeout=0)
+    cache.put('a', 'model-a', 10)
+
+    assert cache.evict_idle(now=time.time() + 10 ** 6) == []
+    assert 'a' in cache
+
+def test_get_evicts_idle_models_but_not_the_requested_one(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(model_registry.time, 'time', lambda: clock[0])
+    cache = ModelCache(max_bytes=1000, idle_timeout=10)
+    cache.put('a', 'model-a', 10)
+    cache.put('b', 'model-b', 10)
+
+    clock[0] += 11
+    assert cache.get('b') == 'model-b'
+    assert 'a' not in cache
+
+    info = cache.info('b')
+    assert info['usage_count'] == 1
+    assert info['last_used'] == clock[0]
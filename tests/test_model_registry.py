@@ -0,0 +1,49 @@
+import json
+import hashlib
+from app.services import model_registry
+from app.services.model_registry import file_sha256, load_manifest
+
+def write_manifest(tmp_path, models, default=None):
+    path = tmp_path / 'models.json'
+    path.write_text(json.dumps({'default': default or next(iter(models)), 'models': models}), encoding='utf-8')
+    return str(path)
+
+def test_model_without_labels_is_registered_as_unavailable(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.Config, 'MODEL_LABELS', [])
+    monkeypatch.setattr(model_registry.Config, 'DEFAULT_MODEL', None)
+    path = write_manifest(tmp_path, {
+        'leaf': {'url': 'https://example.com/leaf.keras', 'labels': None},
+        'veg': {'url': 'https://example.com/veg.keras', 'labels': ['a', 'b']}
+    })
+
+    default_name, specs = load_manifest(path)
+
+    assert default_name == 'leaf'
+    assert not specs['leaf'].available
+    assert 'labels' in specs['leaf'].unavailable_reason
+    assert specs['leaf'].to_dict()['available'] is False
+    assert specs['veg'].available
+    assert specs['veg'].labels == ['a', 'b']
+
+def test_default_model_uses_model_labels(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.Config, 'MODEL_LABELS', ['x', 'y', 'z'])
+    monkeypatch.setattr(model_registry.Config, 'DEFAULT_MODEL', None)
+    path = write_manifest(tmp_path, {'leaf': {'url': 'https://example.com/leaf.keras', 'labels': None}})
+
+    _, specs = load_manifest(path)
+
+    assert specs['leaf'].available
+    assert specs['leaf'].labels == ['x', 'y', 'z']
+
+def test_shipped_manifest_loads(monkeypatch):
+    monkeypatch.setattr(model_registry.Config, 'DEFAULT_MODEL', None)
+    default_name, specs = load_manifest('config/models.json')
+
+    assert default_name in specs
+
+def test_file_sha256_reads_in_chunks(tmp_path):
+    path = tmp_path / 'model.keras'
+    data = bytes(range(256)) * 100
+    path.write_bytes(data)
+
+    assert file_sha256(str(path), chunk_size=1000) == hashlib.sha256(data).hexdigest()
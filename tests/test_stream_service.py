@@ -0,0 +1,122 @@
+import threading
+import time
+import numpy as np
+import pytest
+from app.services.stream_service import (
+    LatestFrameSlot, StreamLimiter, StreamStats, TemporalSmoother, parse_smoothing
+)
+
+def test_latest_frame_slot_keeps_only_the_latest_frame():
+    slot = LatestFrameSlot()
+
+    assert slot.put(1, b'one') is False
+    assert slot.put(2, b'two') is True  # 'one' se descarta sin procesar
+
+    assert slot.take(timeout=0) == (2, b'two')
+    assert slot.take(timeout=0) is None
+
+def test_latest_frame_slot_close_wakes_take():
+    slot = LatestFrameSlot()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(slot.take(timeout=5)))
+    consumer.start()
+
+    time.sleep(0.05)
+    start = time.monotonic()
+    slot.close()
+    consumer.join(timeout=1)
+
+    assert not consumer.is_alive()
+    assert time.monotonic() - start < 1
+    assert result == [None]
+    assert slot.closed
+
+def test_latest_frame_slot_take_times_out():
+    slot = LatestFrameSlot()
+    start = time.monotonic()
+
+    assert slot.take(timeout=0.05) is None
+    assert time.monotonic() - start >= 0.04
+
+def test_temporal_smoother_disabled_passes_probabilities_through():
+    smoother = TemporalSmoother(0.0)
+    probabilities = np.array([0.2, 0.8], dtype=np.float32)
+
+    smoothed, enabled = smoother.update(probabilities)
+
+    assert not enabled
+    np.testing.assert_allclose(smoothed, probabilities)
+
+def test_temporal_smoother_exponential_average():
+    smoother = TemporalSmoother(0.5)
+    smoother.update(np.array([1.0, 0.0]))
+
+    smoothed, enabled = smoother.update(np.array([0.0, 1.0]))
+
+    assert enabled
+    np.testing.assert_allclose(smoothed, [0.5, 0.5])
+
+def test_temporal_smoother_configure_resets_state():
+    smoother = TemporalSmoother(0.5)
+    smoother.update(np.array([1.0, 0.0]))
+
+    smoother.configure(0.9)
+    smoothed, _ = smoother.update(np.array([0.0, 1.0]))
+
+    assert smoother.factor == 0.9
+    np.testing.assert_allclose(smoothed, [0.0, 1.0])
+
+def test_temporal_smoother_restarts_on_shape_change():
+    smoother = TemporalSmoother(0.5)
+    smoother.update(np.array([1.0, 0.0]))
+
+    # Cambio a un modelo con otro número de clases
+    smoothed, _ = smoother.update(np.array([0.2, 0.3, 0.5]))
+
+    np.testing.assert_allclose(smoothed, [0.2, 0.3, 0.5])
+
+def test_stream_stats_counts_and_latency():
+    stats = StreamStats(latency_window=2)
+    stats.record_received(dropped=False)
+    stats.record_received(dropped=True)
+    stats.record_invalid()
+    for latency in (100.0, 10.0, 20.0):
+        stats.record_processed(latency)
+
+    data = stats.to_dict()
+
+    assert data['frames_received'] == 2
+    assert data['frames_dropped'] == 1
+    assert data['frames_invalid'] == 1
+    assert data['frames_processed'] == 3
+    # Solo cuentan las últimas 2 latencias
+    assert data['avg_latency_ms'] == 15.0
+
+def test_stream_stats_without_frames():
+    data = StreamStats().to_dict()
+
+    assert data['avg_latency_ms'] is None
+    assert data['p95_latency_ms'] is None
+
+def test_stream_limiter():
+    limiter = StreamLimiter(2)
+
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.active == 2
+
+    limiter.release()
+    assert limiter.acquire()
+
+    for _ in range(5):
+        limiter.release()
+    assert limiter.active == 0
+
+@pytest.mark.parametrize('value, expected', [(0, 0.0), ('0.5', 0.5), (0.99, 0.99)])
+def test_parse_smoothing_valid(value, expected):
+    assert parse_smoothing(value) == expected
+
+@pytest.mark.parametrize('value', [1, 1.5, -0.1, 'abc', None, [0.5]])
+def test_parse_smoothing_invalid(value):
+    with pytest.raises(ValueError):
+        parse_smoothing(value)
@@ -0,0 +1,126 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from app.utils import tiling_utils
+from app.utils.tiling_utils import (
+    TileLayout, compute_tile_boxes, compute_tile_layout, compute_tile_stride, extract_tiles, parse_tile_grid,
+    parse_tile_overlap, resize_for_tiling
+)
+
+@pytest.mark.parametrize('value, expected', [
+    ('3x4', (3, 4)),
+    ('2X5', (2, 5)),
+    ('3', (3, 3)),
+    (4, (4, 4)),
+    ('1x1', (1, 1)),
+])
+def test_parse_tile_grid_valid(value, expected):
+    assert parse_tile_grid(value) == expected
+
+@pytest.mark.parametrize('value', ['', 'x', '3x', 'ax3', '3x4x5', '2.5x2', None, '0x3', '3x0', '-1x2'])
+def test_parse_tile_grid_invalid(value):
+    with pytest.raises(ValueError):
+        parse_tile_grid(value)
+
+def test_parse_tile_grid_max_tiles(monkeypatch):
+    monkeypatch.setattr(tiling_utils.Config, 'TILE_MAX_TILES', 12)
+    assert parse_tile_grid('3x4') == (3, 4)
+    with pytest.raises(ValueError):
+        parse_tile_grid('4x4')
+
+@pytest.mark.parametrize('value', ['-0.1', '0.95', 'abc', None])
+def test_parse_tile_overlap_invalid(value):
+    with pytest.raises(ValueError):
+        parse_tile_overlap(value)
+
+def test_compute_tile_stride():
+    assert compute_tile_stride((224, 224), 0.25) == (168, 168)
+    assert compute_tile_stride((224, 160), 0.0) == (224, 160)
+    assert compute_tile_stride((2, 2), 0.9) == (1, 1)
+
+def test_extract_tiles_geometry_and_content():
+    tile_size, stride, grid = (4, 6), (3, 4), (2, 3)
+    height = tile_size[0] + (grid[0] - 1) * stride[0]
+    width = tile_size[1] + (grid[1] - 1) * stride[1]
+    canvas = np.arange(height * width * 3, dtype=np.uint8).reshape(height, width, 3)
+
+    tiles = extract_tiles(canvas, tile_size, stride)
+
+    assert tiles.shape == (grid[0], grid[1], tile_size[0], tile_size[1], 3)
+    for row in range(grid[0]):
+        for col in range(grid[1]):
+            y0, x0 = row * stride[0], col * stride[1]
+            np.testing.assert_array_equal(
+                tiles[row, col], canvas[y0:y0 + tile_size[0], x0:x0 + tile_size[1]]
+            )
+    # Es una vista del lienzo, sin copia
+    assert np.shares_memory(tiles, canvas)
+
+def test_compute_tile_boxes_scale_and_origin():
+    layout = TileLayout(canvas_size=(15, 15), stride=(5, 5), scale=(2.0, 2.0), origin=(100.0, 50.0))
+
+    boxes = compute_tile_boxes((2, 2), (10, 10), layout)
+
+    assert boxes == [
+        [100, 50, 120, 70], [110, 50, 130, 70],
+        [100, 60, 120, 80], [110, 60, 130, 80],
+    ]
+    assert layout.region == [100, 50, 130, 80]
+
+def _jpeg(width: int, height: int) -> Image.Image:
+    # Mitad izquierda roja, mitad derecha azul
+    image = Image.new('RGB', (width, height), (255, 0, 0))
+    image.paste((0, 0, 255), (width // 2, 0, width, height))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG')
+    buffer.seek(0)
+    return Image.open(buffer)
+
+@pytest.mark.parametrize('image_size', [(4000, 3000), (3000, 4000), (1000, 1000)])
+def test_default_grid_covers_the_whole_image(image_size):
+    tile_size = (224, 224)
+    grid = parse_tile_grid(tiling_utils.Config.TILE_DEFAULT_GRID)
+    requested = compute_tile_stride(tile_size, tiling_utils.Config.TILE_DEFAULT_OVERLAP)
+
+    layout = compute_tile_layout(image_size, tile_size, grid, requested)
+    boxes = compute_tile_boxes(grid, tile_size, layout)
+
+    assert layout.region == [0, 0, image_size[0], image_size[1]]
+    assert boxes[0][:2] == [0, 0]
+    assert boxes[-1][2:] == [image_size[0], image_size[1]]
+    # El solapamiento solicitado es un mínimo
+    assert layout.stride[0] <= requested[0] and layout.stride[1] <= requested[1]
+
+@pytest.mark.parametrize('grid', [(3, 3), (3, 4), (4, 3), (2, 8)])
+def test_tile_layout_keeps_tiles_square_and_covers_image(grid):
+    tile_size = (224, 224)
+    layout = compute_tile_layout((4000, 3000), tile_size, grid, compute_tile_stride(tile_size, 0.25))
+
+    assert layout.region == [0, 0, 4000, 3000]
+    assert layout.canvas_size == (
+        tile_size[0] + (grid[0] - 1) * layout.stride[0], tile_size[1] + (grid[1] - 1) * layout.stride[1]
+    )
+    assert layout.scale[0] == pytest.approx(layout.scale[1], rel=0.01)
+    for x0, y0, x1, y1 in compute_tile_boxes(grid, tile_size, layout):
+        assert abs((x1 - x0) - (y1 - y0)) <= 0.01 * (x1 - x0)
+        assert 0 <= x0 < x1 <= 4000 and 0 <= y0 < y1 <= 3000
+
+def test_tile_layout_crops_single_tile_axis():
+    tile_size = (224, 224)
+    layout = compute_tile_layout((4000, 3000), tile_size, (1, 1), compute_tile_stride(tile_size, 0.25))
+
+    assert layout.region == [500, 0, 3500, 3000]
+
+def test_resize_for_tiling_maps_image_onto_canvas():
+    tile_size = (224, 224)
+    image = _jpeg(4000, 3000)
+    layout = compute_tile_layout(image.size, tile_size, (3, 4), compute_tile_stride(tile_size, 0.25))
+
+    canvas = resize_for_tiling(image, layout)
+
+    assert canvas.shape == (*layout.canvas_size, 3)
+    # El borde entre rojo y azul (x=2000 en la imagen) cae donde indica la escala
+    middle_row = canvas[canvas.shape[0] // 2]
+    edge = int(np.argmax(middle_row[:, 2] > 128))
+    assert abs(edge - (2000 - layout.origin[0]) / layout.scale[0]) <= 2